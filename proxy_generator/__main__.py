@@ -2,9 +2,17 @@ import os
 from config import DidlReader
 from header.generator import HeaderGenerator
 from methods.generator import MethodsGenerator
-from strategy.generator import StrategyGenerator
+from strategy.generator import StrategyGenerator, CACHED_STRATEGY, STRATEGIES_CODE, resolve_strategy
 from adaptation.generator import AdaptationGenerator
 from remote.generator import RemoteGenerator
+from balancer.generator import BalancerGenerator
+from pool.generator import ConnectionPoolGenerator
+from hedging.generator import HedgingGenerator
+from workers.generator import RemoteWorkersGenerator
+from batching.generator import BatchingGenerator, batched_call, batched_methods
+from cache.generator import OperandCacheGenerator, ResponseCacheGenerator, uses_operand_cache
+from codec.generator import CodecGenerator, apply_codecs, uses_codec
+from membership.generator import MembershipGenerator
 
 IDL_EXTENSION = "didl"
 
@@ -33,20 +41,55 @@ for didl_filepath in idl_resources:
         file_name = didl_filepath.split("/")[-1].replace(f".{IDL_EXTENSION}", ".proxy.dn")
         output_file_path = f"{didl_config.output_folder}/{file_name}"
 
-        strategies = {didl_config.methods[method]['strategy'] for method in didl_config.methods if 'strategy' in didl_config.methods[method]}
+        strategies = {resolve_strategy(didl_config.methods[method]) for method in didl_config.methods if 'strategy' in didl_config.methods[method]}
+        cached_strategies = {batched_call(method, didl_config.methods[method], resolve_strategy(didl_config.methods[method]))
+                             for method in didl_config.methods if didl_config.methods[method].get('strategy') == CACHED_STRATEGY}
 
-        ComponentHeader = HeaderGenerator(interface_filepath, didl_config.dependencies, didl_config.remotes, 'distributed' in strategies)
-        ComponentMethods = MethodsGenerator(didl_config.methods, ComponentHeader.get_interface_name(), didl_config.attributes, component_implementations)
-        ComponentStrategyAndFooter = StrategyGenerator(strategies)
-        ComponentAdaptation = AdaptationGenerator(didl_config.on_active, didl_config.on_inactive)
+        remote_strategies = any(strategy in STRATEGIES_CODE for strategy in strategies)
+        ComponentMembership = MembershipGenerator(didl_config.membership) if didl_config.membership is not None and remote_strategies else None
+        ComponentHedging = HedgingGenerator(didl_config.hedging, ComponentMembership) if didl_config.hedging is not None and 'distribute' in strategies else None
+        ComponentStrategyAndFooter = StrategyGenerator(strategies, cached_strategies, ComponentHedging, didl_config.broadcast, ComponentMembership)
+        ComponentBatching = BatchingGenerator(didl_config.methods) if len(batched_methods(didl_config.methods)) > 0 else None
+        ComponentResponseCache = ResponseCacheGenerator(didl_config.response_cache) if len(cached_strategies) > 0 else None
+        ComponentBalancer = BalancerGenerator(didl_config.balancer, 'broadcast' in strategies, ComponentMembership is not None) if ComponentStrategyAndFooter.uses_remotes() else None
+        ComponentPool = ConnectionPoolGenerator(didl_config.connection_pool, uses_operand_cache(didl_config.methods)) if ComponentStrategyAndFooter.uses_remotes() else None
+        ComponentHeader = HeaderGenerator(interface_filepath, didl_config.dependencies, didl_config.remotes, ComponentBalancer,
+                                          [ComponentPool, ComponentResponseCache, ComponentHedging, ComponentBatching, ComponentMembership])
+        ComponentMethods = MethodsGenerator(apply_codecs(didl_config.methods), ComponentHeader.get_interface_name(), didl_config.attributes, component_implementations,
+                                            ComponentMembership.get_remote_count() if ComponentMembership is not None else "remotes.arrayLength")
+        ComponentAdaptation = AdaptationGenerator(didl_config.on_active, didl_config.on_inactive,
+                                                  ComponentMembership.get_inactive_code() if ComponentMembership is not None else None)
+        OperandCache = OperandCacheGenerator(didl_config.operand_cache) if uses_operand_cache(didl_config.methods) else None
 
         with open(output_file_path, "w") as out_file:
-            ComponentHeader.provide_component_header(out_file)
+            declarations = "\n".join([d for d in [ComponentStrategyAndFooter.get_data_types(),
+                                                   CodecGenerator().get_data_types() if uses_codec(didl_config.methods) else "",
+                                                   OperandCache.get_proxy_data_types() if OperandCache is not None else ""] if d != ""])
+            ComponentHeader.provide_component_header(out_file, declarations,
+                                                     OperandCache.provide_proxy_state() if OperandCache is not None else "")
             out_file.write("\n")
             ComponentMethods.provide_method_implementation(out_file)
             out_file.write("\n")
             ComponentStrategyAndFooter.provide_strategy(out_file)
             out_file.write("\n")
+            if ComponentBalancer is not None:
+                ComponentBalancer.provide_balancer(out_file)
+                out_file.write("\n")
+            if ComponentPool is not None:
+                ComponentPool.provide_pool(out_file)
+                out_file.write("\n")
+            if ComponentResponseCache is not None:
+                ComponentResponseCache.provide_response_cache(out_file)
+                out_file.write("\n")
+            if ComponentHedging is not None:
+                ComponentHedging.provide_hedging(out_file)
+                out_file.write("\n")
+            if ComponentBatching is not None:
+                ComponentBatching.provide_proxy_functions(out_file)
+                out_file.write("\n")
+            if ComponentMembership is not None:
+                ComponentMembership.provide_membership(out_file)
+                out_file.write("\n")
             ComponentAdaptation.provide_daptation(out_file)
             out_file.write("}\n") # close component scope
 
@@ -55,11 +98,17 @@ for didl_filepath in idl_resources:
         output_remote_path = f"server/Remote.{component_name}.dn"
         with open(output_remote_path, "w") as out_file:
             remote_generator = RemoteGenerator(file=out_file, component_name=component_name,
-                                               component_package=component_package, component_methods=didl_config.methods)
+                                               component_package=component_package, component_methods=didl_config.methods,
+                                               operand_cache=OperandCache,
+                                               workers=RemoteWorkersGenerator(didl_config.remote_workers))
             remote_generator.provide_header()
             remote_generator.break_line()
             remote_generator.provide_server_methods()
             remote_generator.break_line()
             remote_generator.provide_processing_method()
             remote_generator.break_line()
+            remote_generator.provide_worker_methods()
+            remote_generator.provide_operand_cache_methods()
+            remote_generator.provide_batch_methods()
+            remote_generator.provide_codec_methods()
             remote_generator.close_component()
@@ -1,8 +1,10 @@
 
 class AdaptationGenerator:
-    def __init__(self, on_active, on_inactive):
+    def __init__(self, on_active, on_inactive, inactive_code=None):
         self.on_active = on_active
         self.on_inactive = on_inactive
+        # statements other generators need run when the proxy is adapted out
+        self.inactive_code = inactive_code if inactive_code is not None else []
 
     def provide_daptation(self, file):
         self.provide_on_active(file)
@@ -27,4 +29,6 @@ class AdaptationGenerator:
                 file.write("\t\t{}()\n".format(instruction['call']))
             elif "assignTo" in instruction and "value" in instruction:
                 file.write("\t\t{} = {}\n".format(instruction['assignTo'], instruction['value']))
+        for line in self.inactive_code:
+            file.write(f"\t\t{line}\n")
         file.write("\t}\n")
\ No newline at end of file
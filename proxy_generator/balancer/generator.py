@@ -0,0 +1,234 @@
+from workers.generator import REMOTE_BUSY_STATUS
+
+# body of pickRemote() for each policy, runs while holding pointerLock
+BALANCER_POLICIES = {
+    "round-robin": "\t\t\tint index = addressPointer\n\t\t\taddressPointer++\n\t\t\tif(addressPointer >= remotes.arrayLength) addressPointer = 0\n",
+    "least-outstanding": "\t\t\tint index = addressPointer\n\t\t\tfor(int i = 1; i < remotes.arrayLength; i++) {\n\t\t\t\tint candidate = (addressPointer + i) % remotes.arrayLength\n\t\t\t\tif(remoteStats[candidate].inFlight < remoteStats[index].inFlight) index = candidate\n\t\t\t}\n\t\t\taddressPointer = (addressPointer + 1) % remotes.arrayLength\n",
+    "ewma": "\t\t\tint index = addressPointer\n\t\t\tfor(int i = 1; i < remotes.arrayLength; i++) {\n\t\t\t\tint candidate = (addressPointer + i) % remotes.arrayLength\n\t\t\t\tif(remoteScore(candidate) < remoteScore(index)) index = candidate\n\t\t\t}\n\t\t\taddressPointer = (addressPointer + 1) % remotes.arrayLength\n",
+    "power-of-two": "\t\t\tint index = nextRandom(remotes.arrayLength)\n\t\t\tif(remotes.arrayLength > 1) {\n\t\t\t\tint other = nextRandom(remotes.arrayLength - 1)\n\t\t\t\tif(other >= index) other++\n\t\t\t\tif(remoteScore(other) < remoteScore(index)) index = other\n\t\t\t}\n",
+}
+
+# the same policies with a membership source, only active remotes are candidates and index stays -1 when
+# there is none; index is declared by pickRemote() since the call fails outside of pointerLock
+ACTIVE_BALANCER_POLICIES = {
+    "round-robin": "\t\t\tfor(int i = 0; i < remotes.arrayLength; i++) {\n\t\t\t\tint candidate = (addressPointer + i) % remotes.arrayLength\n\t\t\t\tif(remoteActive[candidate]) {\n\t\t\t\t\tindex = candidate\n\t\t\t\t\taddressPointer = (candidate + 1) % remotes.arrayLength\n\t\t\t\t\tbreak\n\t\t\t\t}\n\t\t\t}\n",
+    "least-outstanding": "\t\t\tfor(int i = 0; i < remotes.arrayLength; i++) {\n\t\t\t\tint candidate = (addressPointer + i) % remotes.arrayLength\n\t\t\t\tif(remoteActive[candidate] && (index == -1 || remoteStats[candidate].inFlight < remoteStats[index].inFlight)) index = candidate\n\t\t\t}\n\t\t\taddressPointer = (addressPointer + 1) % remotes.arrayLength\n",
+    "ewma": "\t\t\tfor(int i = 0; i < remotes.arrayLength; i++) {\n\t\t\t\tint candidate = (addressPointer + i) % remotes.arrayLength\n\t\t\t\tif(remoteActive[candidate] && (index == -1 || remoteScore(candidate) < remoteScore(index))) index = candidate\n\t\t\t}\n\t\t\taddressPointer = (addressPointer + 1) % remotes.arrayLength\n",
+    "power-of-two": "\t\t\tint active = activeRemoteCount()\n\t\t\tif(active > 0) {\n\t\t\t\tint rank = nextRandom(active)\n\t\t\t\tindex = activeRemoteAt(rank)\n\t\t\t\tif(active > 1) {\n\t\t\t\t\tint otherRank = nextRandom(active - 1)\n\t\t\t\t\tif(otherRank >= rank) otherRank++\n\t\t\t\t\tint other = activeRemoteAt(otherRank)\n\t\t\t\t\tif(remoteScore(other) < remoteScore(index)) index = other\n\t\t\t\t}\n\t\t\t}\n",
+}
+
+DEFAULT_POLICY = "round-robin"
+DEFAULT_EWMA_WEIGHT = 30
+# every failure doubles the smoothed latency of a remote, up to this many ms
+FAILURE_CEILING = 60000
+
+BALANCER_DATA = "data RemoteStats {\n\tint inFlight\n\tint ewmaLatency\n\tint calls\n\tint failures\n}\n"
+
+BALANCER_DEPENDENCIES = [
+    { "lib": "time.Calendar", "alias": "clock" },
+    { "lib": "time.DateUtil", "alias": "dateUtil" },
+]
+
+class BalancerGenerator:
+    def __init__(self, balancer_config, replicated=False, dynamic=False):
+        # replicated strategies address every remote by index and may read from the fastest one
+        self.replicated = replicated
+        # with a membership source some remotes may be inactive, picks then skip them
+        self.dynamic = dynamic
+        if isinstance(balancer_config, str): balancer_config = { "policy": balancer_config }
+        elif balancer_config is None: balancer_config = {}
+
+        self.policy = balancer_config.get("policy", DEFAULT_POLICY)
+        self.ewma_weight = balancer_config.get("ewmaWeight", DEFAULT_EWMA_WEIGHT)
+
+        if self.policy not in BALANCER_POLICIES:
+            raise ValueError(f"unknown balancer policy '{self.policy}', expected one of {', '.join(BALANCER_POLICIES)}")
+
+    def get_data_types(self) -> str:
+        return BALANCER_DATA
+
+    def get_dependencies(self) -> list:
+        return BALANCER_DEPENDENCIES
+
+    def provide_state(self) -> str:
+        state = "\tint addressPointer = 0\n\tMutex pointerLock = new Mutex()\n"
+        state += "\tRemoteStats remoteStats[] = null\n"
+        state += f"\tconst int EWMA_WEIGHT = {self.ewma_weight}\n"
+        state += f"\tconst int FAILURE_CEILING = {FAILURE_CEILING}\n"
+        state += "\tDateTime clockOrigin = null\n"
+        if self.policy == "power-of-two": state += "\tint randomState = 12345\n"
+        return state.rstrip("\n")
+
+    def provide_balancer(self, file):
+        self.provide_call(file)
+        file.write("\n")
+        self.provide_pick(file)
+        file.write("\n")
+        if self.replicated:
+            self.provide_fastest(file)
+            file.write("\n")
+            self.provide_claim(file)
+            file.write("\n")
+        self.provide_prepare(file)
+        file.write("\n")
+        self.provide_release(file)
+        file.write("\n")
+        if self.uses_score():
+            self.provide_score(file)
+            file.write("\n")
+        if self.policy == "power-of-two":
+            self.provide_random(file)
+            file.write("\n")
+        self.provide_clock(file)
+
+    def uses_score(self) -> bool:
+        # least-outstanding and round-robin only compare in-flight calls, unless the fastest remote is read
+        return self.policy in ["ewma", "power-of-two"] or self.replicated
+
+    def provide_call(self, file):
+        # a busy or unreachable remote counts as a failed call and the request moves on to the next pick
+        file.write("\tResponse callBalanced(int index, Request r) {\n")
+        file.write("\t\tResponse res = null\n")
+        file.write("\t\tfor(int attempt = 0; attempt < remotes.arrayLength; attempt++) {\n")
+        file.write("\t\t\tif(attempt > 0) index = pickRemote()\n")
+        file.write("\t\t\tint startedAt = nowMs()\n")
+        file.write("\t\t\tres = callRemote(index, r)\n")
+        file.write(f'\t\t\tbool busy = responseStatus(res) == "{REMOTE_BUSY_STATUS}"\n')
+        file.write("\t\t\treleaseRemote(index, nowMs() - startedAt, res == null || busy)\n")
+        file.write("\t\t\tif(res != null && !busy) return res\n")
+        file.write("\t\t}\n")
+        file.write("\t\treturn res\n")
+        file.write("\t}\n")
+
+    def provide_pick(self, file):
+        file.write("\tint pickRemote() {\n")
+        if self.dynamic: file.write("\t\tint index = -1\n")
+        file.write("\t\tmutex(pointerLock) {\n")
+        file.write("\t\t\tprepareRemoteStats()\n")
+        if self.dynamic:
+            file.write("\t\t\tif(!membershipActive) {\n")
+            file.write("\t\t\t\tmembershipActive = true\n")
+            file.write("\t\t\t\tmembershipGeneration++\n")
+            file.write("\t\t\t\tasynch::refreshMembership(membershipGeneration)\n")
+            file.write("\t\t\t}\n")
+            file.write(ACTIVE_BALANCER_POLICIES[self.policy])
+            file.write("\t\t\tif(index != -1) remoteStats[index].inFlight++\n")
+            file.write("\t\t}\n")
+            file.write("\t\tif(index == -1) throw new Exception(\"no active remote to call\")\n")
+            file.write("\t\treturn index\n")
+            file.write("\t}\n")
+            if self.policy == "power-of-two":
+                file.write("\n")
+                self.provide_active_at(file)
+            return
+        file.write(BALANCER_POLICIES[self.policy])
+        file.write("\t\t\tremoteStats[index].inFlight++\n")
+        file.write("\t\t\treturn index\n")
+        file.write("\t\t}\n")
+        file.write("\t}\n")
+
+    def provide_active_at(self, file):
+        # callers hold pointerLock, rank counts active remotes only
+        file.write("\tint activeRemoteAt(int rank) {\n")
+        file.write("\t\tfor(int i = 0; i < remoteActive.arrayLength; i++) {\n")
+        file.write("\t\t\tif(remoteActive[i]) {\n")
+        file.write("\t\t\t\tif(rank == 0) return i\n")
+        file.write("\t\t\t\trank--\n")
+        file.write("\t\t\t}\n")
+        file.write("\t\t}\n")
+        file.write("\t\treturn -1\n")
+        file.write("\t}\n")
+
+    def provide_fastest(self, file):
+        file.write("\tint pickFastestRemote() {\n")
+        if self.dynamic:
+            file.write("\t\tint index = -1\n")
+            file.write("\t\tmutex(pointerLock) {\n")
+            file.write("\t\t\tprepareRemoteStats()\n")
+            file.write("\t\t\tfor(int i = 0; i < remotes.arrayLength; i++) {\n")
+            file.write("\t\t\t\tif(remoteActive[i] && (index == -1 || remoteScore(i) < remoteScore(index))) index = i\n")
+            file.write("\t\t\t}\n")
+            file.write("\t\t\tif(index != -1) remoteStats[index].inFlight++\n")
+            file.write("\t\t}\n")
+            file.write("\t\tif(index == -1) throw new Exception(\"no active remote to call\")\n")
+            file.write("\t\treturn index\n")
+            file.write("\t}\n")
+            return
+        file.write("\t\tmutex(pointerLock) {\n")
+        file.write("\t\t\tprepareRemoteStats()\n")
+        file.write("\t\t\tint index = 0\n")
+        file.write("\t\t\tfor(int i = 1; i < remotes.arrayLength; i++) {\n")
+        file.write("\t\t\t\tif(remoteScore(i) < remoteScore(index)) index = i\n")
+        file.write("\t\t\t}\n")
+        file.write("\t\t\tremoteStats[index].inFlight++\n")
+        file.write("\t\t\treturn index\n")
+        file.write("\t\t}\n")
+        file.write("\t}\n")
+
+    def provide_claim(self, file):
+        # accounts a call to a given remote, which is later released like a picked one
+        file.write("\tvoid claimRemote(int index) {\n")
+        file.write("\t\tmutex(pointerLock) {\n")
+        file.write("\t\t\tprepareRemoteStats()\n")
+        file.write("\t\t\tremoteStats[index].inFlight++\n")
+        file.write("\t\t}\n")
+        file.write("\t}\n")
+
+    def provide_prepare(self, file):
+        # callers hold pointerLock, remotes only grow so the stats of known remotes are kept
+        file.write("\tvoid prepareRemoteStats() {\n")
+        file.write("\t\tif(remoteStats == null || remoteStats.arrayLength != remotes.arrayLength) {\n")
+        file.write("\t\t\tRemoteStats grown[] = new RemoteStats[remotes.arrayLength]\n")
+        file.write("\t\t\tfor(int i = 0; i < grown.arrayLength; i++) {\n")
+        file.write("\t\t\t\tif(remoteStats != null && i < remoteStats.arrayLength) grown[i] = remoteStats[i]\n")
+        file.write("\t\t\t\telse grown[i] = new RemoteStats()\n")
+        file.write("\t\t\t}\n")
+        file.write("\t\t\tremoteStats = grown\n")
+        file.write("\t\t}\n")
+        if self.dynamic:
+            # new remotes start active, applyMembership sets their actual state right after
+            file.write("\t\tif(remoteActive == null || remoteActive.arrayLength != remotes.arrayLength) {\n")
+            file.write("\t\t\tbool grownActive[] = new bool[remotes.arrayLength]\n")
+            file.write("\t\t\tfor(int i = 0; i < grownActive.arrayLength; i++) {\n")
+            file.write("\t\t\t\tgrownActive[i] = remoteActive == null || i >= remoteActive.arrayLength || remoteActive[i]\n")
+            file.write("\t\t\t}\n")
+            file.write("\t\t\tremoteActive = grownActive\n")
+            file.write("\t\t}\n")
+        file.write("\t}\n")
+
+    def provide_release(self, file):
+        file.write("\tvoid releaseRemote(int index, int latency, bool failed) {\n")
+        file.write("\t\tmutex(pointerLock) {\n")
+        file.write("\t\t\tRemoteStats stats = remoteStats[index]\n")
+        file.write("\t\t\tstats.inFlight--\n")
+        file.write("\t\t\tstats.calls++\n")
+        file.write("\t\t\tif(failed) {\n")
+        file.write("\t\t\t\tstats.failures++\n")
+        file.write("\t\t\t\tstats.ewmaLatency = (stats.ewmaLatency * 2) + 1\n")
+        file.write("\t\t\t\tif(stats.ewmaLatency > FAILURE_CEILING) stats.ewmaLatency = FAILURE_CEILING\n")
+        file.write("\t\t\t} else if(stats.calls == 1) {\n")
+        file.write("\t\t\t\tstats.ewmaLatency = latency\n")
+        file.write("\t\t\t} else {\n")
+        file.write("\t\t\t\tstats.ewmaLatency = ((stats.ewmaLatency * (100 - EWMA_WEIGHT)) + (latency * EWMA_WEIGHT)) / 100\n")
+        file.write("\t\t\t}\n")
+        file.write("\t\t}\n")
+        file.write("\t}\n")
+
+    def provide_score(self, file):
+        # expected wait on a remote: its smoothed latency scaled by the calls already queued there
+        file.write("\tint remoteScore(int index) {\n")
+        file.write("\t\treturn (remoteStats[index].ewmaLatency + 1) * (remoteStats[index].inFlight + 1)\n")
+        file.write("\t}\n")
+
+    def provide_random(self, file):
+        file.write("\tint nextRandom(int bound) {\n")
+        file.write("\t\trandomState = ((randomState * 1103515245) + 12345) % 2147483648\n")
+        file.write("\t\treturn randomState % bound\n")
+        file.write("\t}\n")
+
+    def provide_clock(self, file):
+        file.write("\tint nowMs() {\n")
+        file.write("\t\tDateTime now = clock.getTime()\n")
+        file.write("\t\tif(clockOrigin == null) clockOrigin = now\n")
+        file.write("\t\treturn dateUtil.toMilliseconds(dateUtil.diff(clockOrigin, now))\n")
+        file.write("\t}\n")
@@ -0,0 +1,223 @@
+
+from cache.generator import OPERAND_META_PREFIX, uses_operand_cache
+
+DEFAULT_MAX_SIZE = 16
+DEFAULT_LINGER_MS = 2
+# the remote exposes the batch endpoint of a method under this suffix
+BATCH_SUFFIX = "Batch"
+
+# entries and results travel as frames "<length>:<bytes>", an entry is its metadata count,
+# every metadata name and value and its content, a result is its status and its content
+FRAME_DATA = "data FrameReader {\n\tchar buffer[]\n\tint pos\n}\n\ndata FrameWriter {\n\tchar buffer[]\n\tint pos\n}\n"
+BATCH_DATA = "\n".join([
+    "data BatchSlot {\n\tRequest request\n\tResponse response\n}\n",
+    "data PendingBatch {\n\tBatchSlot slots[]\n\tint count\n\tbool closed\n}\n",
+    FRAME_DATA,
+])
+
+def batched_methods(methods) -> list:
+    return [method for method in methods if 'batched' in methods[method]]
+
+def batched_call(method, props, call) -> str:
+    # batched methods go through their own coalescing function, which flushes with `call`
+    if 'batched' not in props: return call
+    return method + BATCH_SUFFIX
+
+def get_frame_functions() -> list:
+    # frames are measured first and written into one buffer of the exact size
+    return [
+        ("int frameSize(char value[])", [
+            "return iu.makeString(value.arrayLength).arrayLength + 1 + value.arrayLength",
+        ]),
+        ("void writeFrame(FrameWriter writer, char value[])", [
+            "char length[] = iu.makeString(value.arrayLength)",
+            "for(int i = 0; i < length.arrayLength; i++) writer.buffer[writer.pos + i] = length[i]",
+            "writer.pos += length.arrayLength",
+            "writer.buffer[writer.pos] = 58",
+            "writer.pos++",
+            "for(int i = 0; i < value.arrayLength; i++) writer.buffer[writer.pos + i] = value[i]",
+            "writer.pos += value.arrayLength",
+        ]),
+        ("char[] readFrame(FrameReader reader)", [
+            "int length = 0",
+            "while(reader.buffer[reader.pos] != 58) {",
+            "\tlength = (length * 10) + (reader.buffer[reader.pos] - 48)",
+            "\treader.pos++",
+            "}",
+            "reader.pos++",
+            "char value[] = new char[length]",
+            "for(int i = 0; i < length; i++) value[i] = reader.buffer[reader.pos + i]",
+            "reader.pos += length",
+            "return value",
+        ]),
+    ]
+
+class BatchingGenerator:
+    def __init__(self, methods):
+        self.methods = {method: methods[method] for method in batched_methods(methods)}
+        self.operand_cache = uses_operand_cache(self.methods)
+        for method in self.methods:
+            strategy = self.methods[method].get('strategy')
+            inner = self.methods[method].get('cached', {}).get('strategy', 'distribute') if strategy == 'cached' else strategy
+            if inner != 'distribute':
+                raise ValueError(f"method '{method}' is batched, only distribute methods can be batched")
+
+    def get_data_types(self) -> str:
+        return BATCH_DATA
+
+    def get_dependencies(self) -> list:
+        # the leader of a batch lingers with timer.sleep
+        return [{ "lib": "time.Timer", "alias": "timer" }]
+
+    def provide_state(self) -> str:
+        lines = []
+        for method in self.methods:
+            lines += [f"\tPendingBatch {method}OpenBatch = null", f"\tThread {method}BatchSender = null", f"\tMutex {method}BatchLock = new Mutex()"]
+        return "\n".join(lines)
+
+    def get_proxy_functions(self) -> list:
+        functions = []
+        for method in self.methods:
+            functions.append((f"Response {method}{BATCH_SUFFIX}(Request r)", self.get_coalescing(method)))
+            functions.append((f"void {method}{BATCH_SUFFIX}Send(PendingBatch batch)", self.get_sending(method)))
+        functions.append(("void flushBatch(char method[], PendingBatch batch)", [
+            "int size = 0",
+            "for(int i = 0; i < batch.count; i++) {",
+            "\tRequest entry = batch.slots[i].request",
+            "\tsize += frameSize(iu.makeString(entry.meta.arrayLength)) + frameSize(entry.content)",
+            "\tfor(int j = 0; j < entry.meta.arrayLength; j++) size += frameSize(entry.meta[j].name) + frameSize(entry.meta[j].value)",
+            "}",
+            "FrameWriter writer = new FrameWriter(new char[size], 0)",
+            "for(int i = 0; i < batch.count; i++) {",
+            "\tRequest entry = batch.slots[i].request",
+            "\twriteFrame(writer, iu.makeString(entry.meta.arrayLength))",
+            "\tfor(int j = 0; j < entry.meta.arrayLength; j++) {",
+            "\t\twriteFrame(writer, entry.meta[j].name)",
+            "\t\twriteFrame(writer, entry.meta[j].value)",
+            "\t}",
+            "\twriteFrame(writer, entry.content)",
+            "}",
+            # an unreachable remote leaves the slots empty, a failed batch fails every entry with its status
+            f'Response res = distribute(new Request({self.get_batch_meta()}, writer.buffer))',
+            "if(res == null) return",
+            "if(responseStatus(res) != \"200\") {",
+            "\tfor(int i = 0; i < batch.count; i++) batch.slots[i].response = new Response(new Metadata[](new Metadata(\"status\", responseStatus(res))), null)",
+            "\treturn",
+            "}",
+            "FrameReader reader = new FrameReader(res.content, 0)",
+            "for(int i = 0; i < batch.count; i++) {",
+            "\tchar status[] = readFrame(reader)",
+            '\tbatch.slots[i].response = new Response(new Metadata[](new Metadata("status", status)), readFrame(reader))',
+            "}",
+        ]))
+        if self.operand_cache: functions.append(("Metadata[] batchMeta(char method[], PendingBatch batch)", self.get_operand_lifting()))
+        return functions + get_frame_functions()
+
+    def get_batch_meta(self) -> str:
+        if self.operand_cache: return "batchMeta(method, batch)"
+        return f'buildMetaForMethod(new char[](method, "{BATCH_SUFFIX}"))'
+
+    def get_operand_lifting(self) -> list:
+        # the operands referenced by the entries go up to the batch request, once each, so the
+        # connection pool ships them to the remote before the batch
+        return [
+            f'Metadata meta[] = buildMetaForMethod(new char[](method, "{BATCH_SUFFIX}"))',
+            "for(int i = 0; i < batch.count; i++) {",
+            "\tMetadata entryMeta[] = batch.slots[i].request.meta",
+            "\tfor(int j = 0; j < entryMeta.arrayLength; j++) {",
+            f'\t\tbool listed = !su.startsWith(entryMeta[j].name, "{OPERAND_META_PREFIX}")',
+            "\t\tfor(int m = 0; !listed && m < meta.arrayLength; m++) listed = meta[m].name == entryMeta[j].name && meta[m].value == entryMeta[j].value",
+            "\t\tif(!listed) meta = new Metadata[](meta, entryMeta[j])",
+            "\t}",
+            "}",
+            "return meta",
+        ]
+
+    def get_coalescing(self, method) -> list:
+        # the call that opens a batch also starts its sender thread, every call of the batch joins
+        # that thread and finds its response in its slot once the batch is answered
+        max_size = self.methods[method]['batched'].get('maxSize', DEFAULT_MAX_SIZE)
+        return [
+            "BatchSlot slot = new BatchSlot(r)",
+            "Thread sender = null",
+            f"mutex({method}BatchLock) {{",
+            f"\tif({method}OpenBatch == null || {method}OpenBatch.closed || {method}OpenBatch.count == {max_size}) {{",
+            f"\t\t{method}OpenBatch = new PendingBatch(new BatchSlot[{max_size}], 0, false)",
+            f"\t\t{method}BatchSender = asynch::{method}{BATCH_SUFFIX}Send({method}OpenBatch)",
+            "\t}",
+            f"\t{method}OpenBatch.slots[{method}OpenBatch.count] = slot",
+            f"\t{method}OpenBatch.count++",
+            f"\tsender = {method}BatchSender",
+            "}",
+            "sender.join()",
+            "return slot.response",
+        ]
+
+    def get_sending(self, method) -> list:
+        # lingers until the batch is full or the linger time is over, then closes and sends it
+        config = self.methods[method]['batched']
+        max_size = config.get('maxSize', DEFAULT_MAX_SIZE)
+        linger = config.get('lingerMs', DEFAULT_LINGER_MS)
+        return [
+            "int startedAt = nowMs()",
+            f"while(batch.count < {max_size} && nowMs() - startedAt < {linger}) timer.sleep(1)",
+            f"mutex({method}BatchLock) {{",
+            "\tbatch.closed = true",
+            "}",
+            f'flushBatch("{method}", batch)',
+        ]
+
+    def provide_proxy_functions(self, file):
+        for index, (signature, lines) in enumerate(self.get_proxy_functions()):
+            if index > 0: file.write("\n")
+            file.write(f"\t{signature} {{\n")
+            for line in lines: file.write(f"\t\t{line}\n")
+            file.write("\t}\n")
+
+    # remote side: every entry of a batch goes through process() and the results are framed in order
+    def get_remote_data_types(self) -> str:
+        return FRAME_DATA
+
+    def get_remote_dispatch(self) -> list:
+        return [f'if(method == "{method}{BATCH_SUFFIX}") return processBatch(method, req)' for method in self.methods]
+
+    def get_remote_functions(self) -> list:
+        return [
+            ("Response processBatch(char method[], Request req)", [
+                "FrameReader reader = new FrameReader(req.content, 0)",
+                "String statuses[] = new String[16]",
+                "String payloads[] = new String[16]",
+                "int count = 0",
+                "int size = 0",
+                "while(reader.pos < req.content.arrayLength) {",
+                "\tMetadata meta[] = new Metadata[iu.intFromString(readFrame(reader))]",
+                "\tfor(int j = 0; j < meta.arrayLength; j++) {",
+                "\t\tchar name[] = readFrame(reader)",
+                "\t\tmeta[j] = new Metadata(name, readFrame(reader))",
+                "\t}",
+                "\tResponse res = process(new Request(meta, readFrame(reader)))",
+                "\tchar payload[] = res.content",
+                '\tif(payload == null) payload = ""',
+                "\tif(count == statuses.arrayLength) {",
+                "\t\tString grownStatuses[] = new String[count * 2]",
+                "\t\tString grownPayloads[] = new String[count * 2]",
+                "\t\tfor(int i = 0; i < count; i++) {",
+                "\t\t\tgrownStatuses[i] = statuses[i]",
+                "\t\t\tgrownPayloads[i] = payloads[i]",
+                "\t\t}",
+                "\t\tstatuses = grownStatuses",
+                "\t\tpayloads = grownPayloads",
+                "\t}",
+                '\tstatuses[count] = new String(getMetadata(res.meta, "status"))',
+                "\tpayloads[count] = new String(payload)",
+                "\tsize += frameSize(statuses[count].string) + frameSize(payload)",
+                "\tcount++",
+                "}",
+                "FrameWriter writer = new FrameWriter(new char[size], 0)",
+                "for(int i = 0; i < count; i++) {",
+                "\twriteFrame(writer, statuses[i].string)",
+                "\twriteFrame(writer, payloads[i].string)",
+                "}",
+                'return rpc.buildResponseWithData(method, "200", writer.buffer)',
+            ]),
+        ] + get_frame_functions()
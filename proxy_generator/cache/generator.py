@@ -0,0 +1,332 @@
+
+# status answered by the remote when a parameter references an operand it does not hold
+OPERAND_MISSING_STATUS = "412"
+OPERAND_META_PREFIX = "operand:"
+DEFAULT_OPERAND_CACHE_ENTRIES = 16
+# how many (remote, operand hash) pairs the proxy remembers as already shipped
+OPERAND_MEMORY = 64
+# how many operand instances the proxy keeps serialized and hashed
+OPERAND_SOURCES = 8
+# method of the request that ships an operand to a remote ahead of the calls referencing it
+OPERAND_STORE_METHOD = "storeOperand"
+OPERAND_TARGET_META = "target"
+
+OPERAND_DATA = "data CachedOperand {\n\tchar hash[]\n\tData value\n\tint lastUsed\n}\n"
+PROXY_OPERAND_DATA = "data SentOperand {\n\tint remote\n\tchar hash[]\n}\n\ndata OperandSource {\n\tData source\n\tchar hash[]\n\tchar content[]\n\tint lastUsed\n}\n"
+
+def cacheable_parameters(method_props) -> list:
+    return [param for param in method_props.get('parameters', []) if param.get('cacheable', False)]
+
+def uses_operand_cache(methods) -> bool:
+    return any(len(cacheable_parameters(methods[method])) > 0 for method in methods)
+
+def provide_hash_helpers(file):
+    # shared by the operand cache and the response cache of the proxy
+    # two polynomial hashes plus the length, cheap and good enough to tell contents apart
+    file.write("\tchar[] contentHash(char content[]) {\n")
+    file.write("\t\tint first = 7\n")
+    file.write("\t\tint second = 11\n")
+    file.write("\t\tfor(int i = 0; i < content.arrayLength; i++) {\n")
+    file.write("\t\t\tfirst = ((first * 31) + content[i]) % 2147483647\n")
+    file.write("\t\t\tsecond = ((second * 131) + content[i]) % 1000000007\n")
+    file.write("\t\t}\n")
+    file.write("\t\treturn \"$(iu.makeString(content.arrayLength))-$(iu.makeString(first))-$(iu.makeString(second))\"\n")
+    file.write("\t}\n")
+    file.write("\n")
+    file.write("\tchar[] responseStatus(Response res) {\n")
+    file.write("\t\tif(res == null) return null\n")
+    file.write("\t\tfor(int i = 0; i < res.meta.arrayLength; i++) {\n")
+    file.write("\t\t\tif(res.meta[i].name == \"status\") return res.meta[i].value\n")
+    file.write("\t\t}\n")
+    file.write("\t\treturn null\n")
+    file.write("\t}\n")
+    file.write("\n")
+    file.write("\t// a busy or failed remote answers with a status and an error text, never decode that as a result\n")
+    file.write("\tvoid requireSuccess(Response res, char operation[]) {\n")
+    file.write("\t\tchar status[] = responseStatus(res)\n")
+    file.write("\t\tif(status == null) throw new Exception(\"$(operation) got no response from the remotes\")\n")
+    file.write("\t\tif(status != \"200\") throw new Exception(\"$(operation) failed on the remote with status $(status)\")\n")
+    file.write("\t}\n")
+
+class OperandCacheGenerator:
+    def __init__(self, cache_config=None):
+        cache_config = cache_config if cache_config is not None else {}
+        self.entries = cache_config.get('entries', DEFAULT_OPERAND_CACHE_ENTRIES)
+
+    # proxy side: operands are serialized and hashed once per instance, and shipped to every remote
+    # ahead of the first call referencing them there
+    def get_proxy_data_types(self) -> str:
+        return PROXY_OPERAND_DATA
+
+    def provide_proxy_state(self) -> str:
+        return "\n".join([
+            f"\tOperandSource operandSources[] = new OperandSource[{OPERAND_SOURCES}]",
+            "\tint operandClock = 0",
+            f"\tSentOperand sentOperands[] = new SentOperand[{OPERAND_MEMORY}]",
+            "\tint sentOperandsPointer = 0",
+            "\tMutex operandLock = new Mutex()",
+        ])
+
+    def provide_proxy_helpers(self, file):
+        # instances are compared by reference, an operand must not change while calls use it
+        file.write("\tchar[] operandHash(Data source) {\n")
+        file.write("\t\tmutex(operandLock) {\n")
+        file.write("\t\t\tfor(int i = 0; i < operandSources.arrayLength; i++) {\n")
+        file.write("\t\t\t\tif(operandSources[i] != null && operandSources[i].source === source) {\n")
+        file.write("\t\t\t\t\toperandClock++\n")
+        file.write("\t\t\t\t\toperandSources[i].lastUsed = operandClock\n")
+        file.write("\t\t\t\t\treturn operandSources[i].hash\n")
+        file.write("\t\t\t\t}\n")
+        file.write("\t\t\t}\n")
+        file.write("\t\t}\n")
+        file.write("\t\treturn null\n")
+        file.write("\t}\n")
+        file.write("\n")
+        file.write("\tchar[] keepOperand(Data source, char content[]) {\n")
+        file.write("\t\tchar hash[] = contentHash(content)\n")
+        file.write("\t\tmutex(operandLock) {\n")
+        file.write("\t\t\tint slot = 0\n")
+        file.write("\t\t\tfor(int i = 0; i < operandSources.arrayLength; i++) {\n")
+        file.write("\t\t\t\tif(operandSources[i] == null) {\n")
+        file.write("\t\t\t\t\tslot = i\n")
+        file.write("\t\t\t\t\tbreak\n")
+        file.write("\t\t\t\t}\n")
+        file.write("\t\t\t\tif(operandSources[i].lastUsed < operandSources[slot].lastUsed) slot = i\n")
+        file.write("\t\t\t}\n")
+        file.write("\t\t\toperandClock++\n")
+        file.write("\t\t\toperandSources[slot] = new OperandSource(source, hash, content, operandClock)\n")
+        file.write("\t\t}\n")
+        file.write("\t\treturn hash\n")
+        file.write("\t}\n")
+        file.write("\n")
+        file.write("\tchar[] operandContent(char hash[]) {\n")
+        file.write("\t\tmutex(operandLock) {\n")
+        file.write("\t\t\tfor(int i = 0; i < operandSources.arrayLength; i++) {\n")
+        file.write("\t\t\t\tif(operandSources[i] != null && operandSources[i].hash == hash) return operandSources[i].content\n")
+        file.write("\t\t\t}\n")
+        file.write("\t\t}\n")
+        file.write("\t\treturn null\n")
+        file.write("\t}\n")
+        file.write("\n")
+        file.write("\tbool operandSent(int remote, char hash[]) {\n")
+        file.write("\t\tmutex(operandLock) {\n")
+        file.write("\t\t\tfor(int i = 0; i < sentOperands.arrayLength; i++) {\n")
+        file.write("\t\t\t\tif(sentOperands[i] != null && sentOperands[i].remote == remote && sentOperands[i].hash == hash) return true\n")
+        file.write("\t\t\t}\n")
+        file.write("\t\t}\n")
+        file.write("\t\treturn false\n")
+        file.write("\t}\n")
+        file.write("\n")
+        file.write("\tvoid rememberOperand(int remote, char hash[]) {\n")
+        file.write("\t\tif(operandSent(remote, hash)) return\n")
+        file.write("\t\tmutex(operandLock) {\n")
+        file.write("\t\t\tsentOperands[sentOperandsPointer] = new SentOperand(remote, hash)\n")
+        file.write("\t\t\tsentOperandsPointer = (sentOperandsPointer + 1) % sentOperands.arrayLength\n")
+        file.write("\t\t}\n")
+        file.write("\t}\n")
+        file.write("\n")
+        # a 412 means the remote evicted an operand, every operand of the call is shipped again and
+        # the call repeated once; an operand no longer kept here is left to the caller's full re-send
+        file.write("\tResponse makeWithOperands(int remote, RPCUtil link, Request r) {\n")
+        file.write("\t\tif(!shipOperands(remote, link, r, false)) return null\n")
+        file.write("\t\tResponse res = link.make(r)\n")
+        file.write(f'\t\tif(responseStatus(res) == "{OPERAND_MISSING_STATUS}" && shipOperands(remote, link, r, true)) res = link.make(r)\n')
+        file.write("\t\treturn res\n")
+        file.write("\t}\n")
+        file.write("\n")
+        file.write("\tbool shipOperands(int remote, RPCUtil link, Request r, bool again) {\n")
+        file.write("\t\tchar target[] = null\n")
+        file.write("\t\tfor(int i = 0; i < r.meta.arrayLength; i++) {\n")
+        file.write('\t\t\tif(r.meta[i].name == "method") target = r.meta[i].value\n')
+        file.write("\t\t}\n")
+        file.write("\t\tfor(int i = 0; i < r.meta.arrayLength; i++) {\n")
+        file.write("\t\t\tMetadata operand = r.meta[i]\n")
+        file.write(f'\t\t\tif(su.startsWith(operand.name, "{OPERAND_META_PREFIX}") && (again || !operandSent(remote, operand.value))) {{\n')
+        file.write("\t\t\t\tchar content[] = operandContent(operand.value)\n")
+        file.write("\t\t\t\tif(content != null) {\n")
+        file.write(f'\t\t\t\t\tMetadata meta[] = new Metadata[](new Metadata("method", "{OPERAND_STORE_METHOD}"), new Metadata("{OPERAND_TARGET_META}", target), operand)\n')
+        file.write("\t\t\t\t\tResponse stored = link.make(new Request(meta, content))\n")
+        file.write("\t\t\t\t\tif(stored == null) return false\n")
+        file.write('\t\t\t\t\tif(responseStatus(stored) == "200") rememberOperand(remote, operand.value)\n')
+        file.write("\t\t\t\t}\n")
+        file.write("\t\t\t}\n")
+        file.write("\t\t}\n")
+        file.write("\t\treturn true\n")
+        file.write("\t}\n")
+
+    # remote side: bounded LRU of parsed operands
+    def get_remote_data_types(self) -> str:
+        return OPERAND_DATA
+
+    def get_remote_state(self) -> list:
+        return [
+            f"CachedOperand operandCache[] = new CachedOperand[{self.entries}]",
+            "int operandClock = 0",
+            "Mutex operandLock = new Mutex()",
+        ]
+
+    def get_remote_load(self) -> list:
+        return [
+            "if(hash == null) return null",
+            "mutex(operandLock) {",
+            "\tfor(int i = 0; i < operandCache.arrayLength; i++) {",
+            "\t\tif(operandCache[i] != null && operandCache[i].hash == hash) {",
+            "\t\t\toperandClock++",
+            "\t\t\toperandCache[i].lastUsed = operandClock",
+            "\t\t\treturn operandCache[i].value",
+            "\t\t}",
+            "\t}",
+            "}",
+            "return null",
+        ]
+
+    def get_remote_store(self) -> list:
+        return [
+            "if(hash == null) return",
+            "mutex(operandLock) {",
+            "\tint slot = 0",
+            "\tfor(int i = 0; i < operandCache.arrayLength; i++) {",
+            "\t\tif(operandCache[i] == null || operandCache[i].hash == hash) {",
+            "\t\t\tslot = i",
+            "\t\t\tbreak",
+            "\t\t}",
+            "\t\tif(operandCache[i].lastUsed < operandCache[slot].lastUsed) slot = i",
+            "\t}",
+            "\toperandClock++",
+            "\toperandCache[slot] = new CachedOperand(hash, value, operandClock)",
+            "}",
+        ]
+
+DEFAULT_RESPONSE_CACHE_ENTRIES = 64
+DEFAULT_RESPONSE_CACHE_BYTES = 4194304
+DEFAULT_RESPONSE_CACHE_TTL_MS = 0
+DEFAULT_RESPONSE_CACHE_STATS_EVERY = 1000
+
+RESPONSE_DATA = "data CachedResponse {\n\tchar key[]\n\tchar request[]\n\tResponse response\n\tint size\n\tint lastUsed\n\tint storedAt\n}\n"
+
+RESPONSE_CACHE_DEPENDENCIES = [
+    { "lib": "io.Output", "alias": "out" },
+]
+
+class ResponseCacheGenerator:
+    # proxy side: bounded LRU of remote responses used by the `cached` strategy
+    def __init__(self, cache_config=None):
+        cache_config = cache_config if cache_config is not None else {}
+        self.entries = cache_config.get('entries', DEFAULT_RESPONSE_CACHE_ENTRIES)
+        self.max_bytes = cache_config.get('maxBytes', DEFAULT_RESPONSE_CACHE_BYTES)
+        self.ttl = cache_config.get('ttlMs', DEFAULT_RESPONSE_CACHE_TTL_MS)
+        self.stats_every = cache_config.get('statsEvery', DEFAULT_RESPONSE_CACHE_STATS_EVERY)
+
+    def get_data_types(self) -> str:
+        return RESPONSE_DATA
+
+    def get_dependencies(self) -> list:
+        return RESPONSE_CACHE_DEPENDENCIES
+
+    def provide_state(self) -> str:
+        return "\n".join([
+            f"\tconst int RESPONSE_CACHE_BYTES = {self.max_bytes}",
+            f"\tconst int RESPONSE_CACHE_TTL = {self.ttl}",
+            f"\tconst int RESPONSE_CACHE_STATS_EVERY = {self.stats_every}",
+            f"\tCachedResponse responseCache[] = new CachedResponse[{self.entries}]",
+            "\tint responseBytes = 0",
+            "\tint responseClock = 0",
+            "\tint responseHits = 0",
+            "\tint responseMisses = 0",
+            "\tint responseEvictions = 0",
+            "\tint responseExpirations = 0",
+            "\tMutex responseLock = new Mutex()",
+        ])
+
+    def provide_response_cache(self, file):
+        self.provide_key(file)
+        file.write("\n")
+        self.provide_lookup(file)
+        file.write("\n")
+        self.provide_store(file)
+        file.write("\n")
+        self.provide_drop(file)
+        file.write("\n")
+        self.provide_clear(file)
+        file.write("\n")
+        self.provide_report(file)
+
+    def provide_key(self, file):
+        # the metadata carries the method name and the hashes of operands sent by reference, the
+        # content hash only narrows the search, a hit also compares the whole request body
+        file.write("\tchar[] requestKey(Request r) {\n")
+        file.write("\t\tchar key[] = contentHash(r.content)\n")
+        file.write("\t\tfor(int i = 0; i < r.meta.arrayLength; i++) key = new char[](key, \"|\", r.meta[i].value)\n")
+        file.write("\t\treturn key\n")
+        file.write("\t}\n")
+
+    def provide_lookup(self, file):
+        file.write("\tResponse lookupResponse(char key[], char request[]) {\n")
+        file.write("\t\tResponse found = null\n")
+        file.write("\t\tmutex(responseLock) {\n")
+        file.write("\t\t\tfor(int i = 0; i < responseCache.arrayLength; i++) {\n")
+        file.write("\t\t\t\tif(responseCache[i] != null && responseCache[i].key == key && responseCache[i].request == request) {\n")
+        file.write("\t\t\t\t\tif(RESPONSE_CACHE_TTL > 0 && nowMs() - responseCache[i].storedAt > RESPONSE_CACHE_TTL) {\n")
+        file.write("\t\t\t\t\t\tdropResponse(i)\n")
+        file.write("\t\t\t\t\t\tresponseExpirations++\n")
+        file.write("\t\t\t\t\t} else {\n")
+        file.write("\t\t\t\t\t\tresponseClock++\n")
+        file.write("\t\t\t\t\t\tresponseCache[i].lastUsed = responseClock\n")
+        file.write("\t\t\t\t\t\tfound = responseCache[i].response\n")
+        file.write("\t\t\t\t\t}\n")
+        file.write("\t\t\t\t\tbreak\n")
+        file.write("\t\t\t\t}\n")
+        file.write("\t\t\t}\n")
+        file.write("\t\t\tif(found != null) responseHits++\n")
+        file.write("\t\t\telse responseMisses++\n")
+        file.write("\t\t\tif(RESPONSE_CACHE_STATS_EVERY > 0 && (responseHits + responseMisses) % RESPONSE_CACHE_STATS_EVERY == 0) reportResponseCache()\n")
+        file.write("\t\t}\n")
+        file.write("\t\treturn found\n")
+        file.write("\t}\n")
+
+    def provide_store(self, file):
+        # evicts least recently used responses until both the entry and the byte limits hold
+        file.write("\tvoid storeResponse(char key[], char request[], Response res) {\n")
+        file.write("\t\tint size = key.arrayLength + request.arrayLength + res.content.arrayLength\n")
+        file.write("\t\tif(size > RESPONSE_CACHE_BYTES) return\n")
+        file.write("\t\tmutex(responseLock) {\n")
+        file.write("\t\t\tint slot = -1\n")
+        file.write("\t\t\tfor(int i = 0; i < responseCache.arrayLength; i++) {\n")
+        file.write("\t\t\t\tif(responseCache[i] != null && responseCache[i].key == key && responseCache[i].request == request) dropResponse(i)\n")
+        file.write("\t\t\t\tif(responseCache[i] == null && slot == -1) slot = i\n")
+        file.write("\t\t\t}\n")
+        file.write("\t\t\twhile(slot == -1 || responseBytes + size > RESPONSE_CACHE_BYTES) {\n")
+        file.write("\t\t\t\tint victim = -1\n")
+        file.write("\t\t\t\tfor(int i = 0; i < responseCache.arrayLength; i++) {\n")
+        file.write("\t\t\t\t\tif(responseCache[i] != null && (victim == -1 || responseCache[i].lastUsed < responseCache[victim].lastUsed)) victim = i\n")
+        file.write("\t\t\t\t}\n")
+        file.write("\t\t\t\tdropResponse(victim)\n")
+        file.write("\t\t\t\tresponseEvictions++\n")
+        file.write("\t\t\t\tif(slot == -1) slot = victim\n")
+        file.write("\t\t\t}\n")
+        file.write("\t\t\tresponseClock++\n")
+        file.write("\t\t\tresponseCache[slot] = new CachedResponse(key, request, res, size, responseClock, nowMs())\n")
+        file.write("\t\t\tresponseBytes += size\n")
+        file.write("\t\t}\n")
+        file.write("\t}\n")
+
+    def provide_drop(self, file):
+        # callers hold responseLock
+        file.write("\tvoid dropResponse(int slot) {\n")
+        file.write("\t\tresponseBytes -= responseCache[slot].size\n")
+        file.write("\t\tresponseCache[slot] = null\n")
+        file.write("\t}\n")
+
+    def provide_clear(self, file):
+        file.write("\tvoid clearResponses() {\n")
+        file.write("\t\tmutex(responseLock) {\n")
+        file.write("\t\t\tfor(int i = 0; i < responseCache.arrayLength; i++) {\n")
+        file.write("\t\t\t\tif(responseCache[i] != null) dropResponse(i)\n")
+        file.write("\t\t\t}\n")
+        file.write("\t\t}\n")
+        file.write("\t}\n")
+
+    def provide_report(self, file):
+        file.write("\tvoid reportResponseCache() {\n")
+        file.write("\t\tout.println(\"[@Proxy] response cache hits=$(iu.makeString(responseHits)) misses=$(iu.makeString(responseMisses)) evictions=$(iu.makeString(responseEvictions)) expirations=$(iu.makeString(responseExpirations)) bytes=$(iu.makeString(responseBytes))\")\n")
+        file.write("\t}\n")
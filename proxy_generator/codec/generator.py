@@ -0,0 +1,178 @@
+
+# int32-packed: every integer is zigzag encoded and written as little-endian base-32
+# digits, a matrix starts with its shape (rows, columns) and a line with its length.
+# A matrix then holds a layout flag: dense (0) is followed by every value row by row,
+# sparse (1) by the non-zero count of each row and its (column gap, value) pairs; the
+# encoder takes whichever is smaller, so identity and diagonal operands ship in O(n).
+# Digits are printable characters so the payload survives the JSON request envelope
+# and never contains the quote, the backslash or the Constants.EOF framing.
+# Final digit of a value: chars 93..124, continuation digit: chars 59..90.
+CODECS = {
+    "int32-packed": {
+        "Matrix": { "encoder": "packMatrix({})", "decoder": "unpackMatrix({})" },
+        "Line": { "encoder": "packLine({})", "decoder": "unpackLine({})" },
+    },
+}
+
+CODEC_DATA = "data PackedReader {\n\tchar buffer[]\n\tint pos\n}\n"
+
+def get_codec(codec, type_name) -> dict:
+    if codec not in CODECS: raise ValueError(f"unknown codec '{codec}', expected one of {', '.join(CODECS)}")
+    if type_name not in CODECS[codec]: raise ValueError(f"codec '{codec}' does not support type '{type_name}'")
+    return CODECS[codec][type_name]
+
+def uses_codec(methods) -> bool:
+    for method in methods:
+        props = methods[method]
+        if 'returnCodec' in props: return True
+        if any('codec' in param for param in props.get('parameters', [])): return True
+    return False
+
+def apply_codecs(methods) -> dict:
+    # proxy side view of the methods: codec encoders and decoders replace the text parsers
+    coded_methods = {}
+    for method in methods:
+        props = dict(methods[method])
+        if 'returnCodec' in props:
+            props['returnParser'] = get_codec(props['returnCodec'], props['returnType'])['decoder']
+        if 'parameters' in props:
+            props['parameters'] = [dict(param, stringParser=get_codec(param['codec'], param['type'])['encoder'])
+                                   if 'codec' in param else param for param in props['parameters']]
+        coded_methods[method] = props
+    return coded_methods
+
+class CodecGenerator:
+    def get_data_types(self) -> str:
+        return CODEC_DATA
+
+    def get_functions(self) -> list:
+        return [
+            ("int packedSize(int value)", [
+                "int digits = 1",
+                "if(value < 0) value = (0 - value) * 2 - 1",
+                "else value = value * 2",
+                "while(value >= 32) {",
+                "\tvalue = value / 32",
+                "\tdigits++",
+                "}",
+                "return digits",
+            ]),
+            ("int writePacked(char buffer[], int pos, int value)", [
+                "if(value < 0) value = (0 - value) * 2 - 1",
+                "else value = value * 2",
+                "while(value >= 32) {",
+                "\tbuffer[pos] = 59 + (value % 32)",
+                "\tvalue = value / 32",
+                "\tpos++",
+                "}",
+                "buffer[pos] = 93 + value",
+                "return pos + 1",
+            ]),
+            ("int readPacked(PackedReader reader)", [
+                "int value = 0",
+                "int scale = 1",
+                "while(reader.buffer[reader.pos] < 93) {",
+                "\tvalue += (reader.buffer[reader.pos] - 59) * scale",
+                "\tscale = scale * 32",
+                "\treader.pos++",
+                "}",
+                "value += (reader.buffer[reader.pos] - 93) * scale",
+                "reader.pos++",
+                "if(value % 2 == 0) return value / 2",
+                "return 0 - ((value + 1) / 2)",
+            ]),
+            ("char[] packMatrix(Matrix matrix)", [
+                "int rows = matrix.lines.arrayLength",
+                "int columns = 0",
+                "if(rows > 0) columns = matrix.lines[0].line.arrayLength",
+                "int denseSize = 0",
+                "int sparseSize = 0",
+                "for(int i = 0; i < rows; i++) {",
+                "\tint values[] = matrix.lines[i].line",
+                "\tint nonZero = 0",
+                "\tint last = -1",
+                "\tfor(int j = 0; j < columns; j++) {",
+                "\t\tdenseSize += packedSize(values[j])",
+                "\t\tif(values[j] != 0) {",
+                "\t\t\tsparseSize += packedSize(j - last - 1) + packedSize(values[j])",
+                "\t\t\tlast = j",
+                "\t\t\tnonZero++",
+                "\t\t}",
+                "\t}",
+                "\tsparseSize += packedSize(nonZero)",
+                "}",
+                "bool sparse = sparseSize < denseSize",
+                "int size = packedSize(rows) + packedSize(columns) + 1",
+                "if(sparse) size += sparseSize",
+                "else size += denseSize",
+                "char buffer[] = new char[size]",
+                "int pos = writePacked(buffer, 0, rows)",
+                "pos = writePacked(buffer, pos, columns)",
+                "if(sparse) pos = writePacked(buffer, pos, 1)",
+                "else pos = writePacked(buffer, pos, 0)",
+                "for(int i = 0; i < rows; i++) {",
+                "\tint values[] = matrix.lines[i].line",
+                "\tif(sparse) {",
+                "\t\tint nonZero = 0",
+                "\t\tfor(int j = 0; j < columns; j++) {",
+                "\t\t\tif(values[j] != 0) nonZero++",
+                "\t\t}",
+                "\t\tpos = writePacked(buffer, pos, nonZero)",
+                "\t\tint last = -1",
+                "\t\tfor(int j = 0; j < columns; j++) {",
+                "\t\t\tif(values[j] != 0) {",
+                "\t\t\t\tpos = writePacked(buffer, pos, j - last - 1)",
+                "\t\t\t\tpos = writePacked(buffer, pos, values[j])",
+                "\t\t\t\tlast = j",
+                "\t\t\t}",
+                "\t\t}",
+                "\t} else {",
+                "\t\tfor(int j = 0; j < columns; j++) pos = writePacked(buffer, pos, values[j])",
+                "\t}",
+                "}",
+                "return buffer",
+            ]),
+            ("Matrix unpackMatrix(char packed[])", [
+                "PackedReader reader = new PackedReader(packed, 0)",
+                "int rows = readPacked(reader)",
+                "int columns = readPacked(reader)",
+                "bool sparse = readPacked(reader) == 1",
+                "Matrix matrix = new Matrix(new Line[rows])",
+                "for(int i = 0; i < rows; i++) {",
+                "\tint values[] = new int[columns]",
+                "\tif(sparse) {",
+                "\t\tint nonZero = readPacked(reader)",
+                "\t\tint column = -1",
+                "\t\tfor(int n = 0; n < nonZero; n++) {",
+                "\t\t\tcolumn += readPacked(reader) + 1",
+                "\t\t\tvalues[column] = readPacked(reader)",
+                "\t\t}",
+                "\t} else {",
+                "\t\tfor(int j = 0; j < columns; j++) values[j] = readPacked(reader)",
+                "\t}",
+                "\tmatrix.lines[i] = new Line(values)",
+                "}",
+                "return matrix",
+            ]),
+            ("char[] packLine(Line line)", [
+                "int size = packedSize(line.line.arrayLength)",
+                "for(int i = 0; i < line.line.arrayLength; i++) size += packedSize(line.line[i])",
+                "char buffer[] = new char[size]",
+                "int pos = writePacked(buffer, 0, line.line.arrayLength)",
+                "for(int i = 0; i < line.line.arrayLength; i++) pos = writePacked(buffer, pos, line.line[i])",
+                "return buffer",
+            ]),
+            ("Line unpackLine(char packed[])", [
+                "PackedReader reader = new PackedReader(packed, 0)",
+                "int values[] = new int[readPacked(reader)]",
+                "for(int i = 0; i < values.arrayLength; i++) values[i] = readPacked(reader)",
+                "return new Line(values)",
+            ]),
+        ]
+
+    def provide_functions(self, file):
+        for index, (signature, lines) in enumerate(self.get_functions()):
+            if index > 0: file.write("\n")
+            file.write(f"\t{signature} {{\n")
+            for line in lines: file.write(f"\t\t{line}\n")
+            file.write("\t}\n")
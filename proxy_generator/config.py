@@ -6,8 +6,16 @@ class DidlReader:
         self.output_folder = config_json['outputFolder']
         self.component_file = config_json['componentFile']
         self.remotes = config_json['remotes']
+        self.membership = config_json.get('membership', None)
+        self.balancer = config_json.get('balancer', 'round-robin')
+        self.connection_pool = config_json.get('connectionPool', {})
+        self.hedging = config_json.get('hedging', None)
+        self.broadcast = config_json.get('broadcast', {})
         self.dependencies = config_json['dependencies']
         self.attributes = config_json['attributes']
+        self.operand_cache = config_json.get('operandCache', {})
+        self.remote_workers = config_json.get('remoteWorkers', {})
+        self.response_cache = config_json.get('responseCache', {})
         self.methods = config_json['methods']
         self.on_active = config_json['onActive']
         self.on_inactive = config_json['onInactive']
@@ -1,21 +1,34 @@
 
 class HeaderGenerator:
-    def __init__(self, interface_file_path, dependencies, remotes, use_basic_balancer):
+    def __init__(self, interface_file_path, dependencies, remotes, balancer=None, extensions=None):
+        # extensions (connection pool, response cache, hedging...) add dependencies, data types and state to the proxy
+        self.balancer = balancer
+        self.extensions = [extension for extension in extensions if extension is not None] if extensions is not None else []
+        if self.balancer is not None: dependencies = self.merge_dependencies(dependencies, self.balancer.get_dependencies())
+        for extension in self.extensions: dependencies = self.merge_dependencies(dependencies, extension.get_dependencies())
         self.name = self.get_component_name(interface_file_path)
         self.general_dependencies = self.provide_general_dependecies(dependencies)
         self.component_dependencies = self.provide_component_dependecies(dependencies)
         self.remotes = remotes
-        self.use_basic_balancer = use_basic_balancer
 
     def get_component_name(self, interface_file_path) -> str:
         return interface_file_path.replace("resources/", "").replace(".dn", "").replace("/", ".")
 
-    def provide_component_header(self, file):
+    def provide_component_header(self, file, declarations="", resources=""):
         file.write(self.general_dependencies)
         file.write("\n")
+        data_types = [extension.get_data_types() for extension in self.extensions]
+        if self.balancer is not None: data_types = [self.balancer.get_data_types()] + data_types
+        declarations = "\n".join([d for d in data_types + [declarations] if d != ""])
+        if declarations != "":
+            file.write(declarations)
+            file.write("\n")
         file.write(f"component provides {self.name}(AdaptEvents) {self.get_component_definition()}" + " {\n")
         file.write(self.provide_component_resources())
         file.write("\n")
+        if resources != "":
+            file.write(resources)
+            file.write("\n")
 
     def get_component_definition(self) -> str:
         if self.component_dependencies != "":
@@ -23,16 +36,23 @@ class HeaderGenerator:
         else:
             return ""
     
+    def merge_dependencies(self, dependencies, extra_dependencies) -> list:
+        required_libs = {dep['lib'] for dep in dependencies}
+        return dependencies + [dep for dep in extra_dependencies if dep['lib'] not in required_libs]
+
     def provide_general_dependecies(self, dependencies) -> str:
         return "".join([f"uses {dep['lib']}\n" for dep in dependencies if dep['alias'] == None])
     
     def provide_component_dependecies(self, dependencies) -> str:
-        return "".join([f"{dep['lib']} {dep['alias']}, " for dep in dependencies if dep['alias'] != None])
+        # an empty alias requires the interface without instantiating it, so the component can create its own instances
+        return "".join([f"{dep['lib']} {dep['alias']}, " if dep['alias'] != "" else f"{dep['lib']}, "
+                        for dep in dependencies if dep['alias'] != None])
     
     def provide_component_resources(self):
         resources = ""
         resources += self.provide_addressess()
         resources += self.provide_balancer()
+        for extension in self.extensions: resources += "\n" + extension.provide_state()
         return resources
     
     def provide_addressess(self) -> str:
@@ -53,6 +73,7 @@ class HeaderGenerator:
         return var_assign
     
     def provide_balancer(self) -> str:
+        if self.balancer is not None: return self.balancer.provide_state()
         return "\tint addressPointer = 0\n\tMutex pointerLock = new Mutex()"
     
     def get_interface_name(self) -> str:
@@ -0,0 +1,200 @@
+
+DEFAULT_DELAY_MS = 0
+DEFAULT_MIN_DELAY_MS = 5
+DEFAULT_MAX_PERCENT = 5
+DEFAULT_PERCENTILE = 95
+DEFAULT_WINDOW = 128
+DEFAULT_STATS_EVERY = 1000
+# the tracked percentile is recomputed every HEDGE_REFRESH recorded latencies
+HEDGE_REFRESH = 16
+
+# waiter is the thread of the distributed call, signalled when the call is done or, for the
+# primary, once the hedge delay is over (late)
+HEDGE_DATA = "data HedgeCall {\n\tint remote\n\tRequest request\n\tResponse response\n\tbool done\n\tbool late\n\tThread waiter\n}\n"
+
+HEDGE_DEPENDENCIES = [
+    { "lib": "io.Output", "alias": "out" },
+    { "lib": "time.Timer", "alias": "timer" },
+]
+
+class HedgingGenerator:
+    def __init__(self, hedging_config=None, membership=None):
+        hedging_config = hedging_config if hedging_config is not None else {}
+        self.membership = membership
+        # a delayMs of 0 hedges after the tracked percentile of recent latencies
+        self.delay = hedging_config.get('delayMs', DEFAULT_DELAY_MS)
+        self.min_delay = hedging_config.get('minDelayMs', DEFAULT_MIN_DELAY_MS)
+        self.max_percent = hedging_config.get('maxPercent', DEFAULT_MAX_PERCENT)
+        self.percentile = hedging_config.get('percentile', DEFAULT_PERCENTILE)
+        self.window = hedging_config.get('window', DEFAULT_WINDOW)
+        self.stats_every = hedging_config.get('statsEvery', DEFAULT_STATS_EVERY)
+
+    def get_data_types(self) -> str:
+        return HEDGE_DATA
+
+    def get_dependencies(self) -> list:
+        return HEDGE_DEPENDENCIES
+
+    def provide_state(self) -> str:
+        return "\n".join([
+            f"\tconst int HEDGE_DELAY = {self.delay}",
+            f"\tconst int HEDGE_MIN_DELAY = {self.min_delay}",
+            f"\tconst int HEDGE_MAX_PERCENT = {self.max_percent}",
+            f"\tconst int HEDGE_PERCENTILE = {self.percentile}",
+            f"\tconst int HEDGE_STATS_EVERY = {self.stats_every}",
+            f"\tint hedgeLatencies[] = new int[{self.window}]",
+            "\tint hedgeLatencyPointer = 0",
+            "\tint hedgeSamples = 0",
+            f"\tint hedgeThreshold = {self.min_delay}",
+            "\tint hedgeCalls = 0",
+            "\tint hedgesFired = 0",
+            "\tint hedgesWon = 0",
+            "\tMutex hedgeLock = new Mutex()",
+        ])
+
+    def get_distribute_code(self) -> str:
+        # the primary call runs asynchronously; once it is slower than the hedge delay the same
+        # request goes to another remote and the first successful reply wins, the loser is dropped.
+        # The calling thread sleeps until a call or the hedge alarm signals it, the loops only
+        # re-check after a wakeup, a signal that came in before wait() is not lost
+        return "".join([
+            "\t\tThread waiter = this.thread\n",
+            "\t\tHedgeCall primary = new HedgeCall(pickRemote(), r, null, false, false, waiter)\n",
+            "\t\tasynch::hedgeCall(primary)\n",
+            "\t\tasynch::hedgeAlarm(primary, hedgeDelay())\n",
+            "\t\twhile(!primary.done && !primary.late) waiter.wait()\n",
+            "\t\tif(primary.done || !startHedge()) {\n",
+            "\t\t\twhile(!primary.done) waiter.wait()\n",
+            "\t\t\treturn primary.response\n",
+            "\t\t}\n",
+            "\t\tHedgeCall backup = new HedgeCall(pickBackupRemote(primary.remote), r, null, false, false, waiter)\n",
+            "\t\tasynch::hedgeCall(backup)\n",
+            "\t\twhile(true) {\n",
+            "\t\t\tif(backup.done && backup.response != null) {\n",
+            "\t\t\t\trecordHedgeWin()\n",
+            "\t\t\t\treturn backup.response\n",
+            "\t\t\t}\n",
+            "\t\t\tif(primary.done && (primary.response != null || backup.done)) return primary.response\n",
+            "\t\t\twaiter.wait()\n",
+            "\t\t}\n",
+            "\t\treturn null\n",
+        ])
+
+    def provide_hedging(self, file):
+        self.provide_call(file)
+        file.write("\n")
+        self.provide_alarm(file)
+        file.write("\n")
+        self.provide_backup(file)
+        file.write("\n")
+        self.provide_delay(file)
+        file.write("\n")
+        self.provide_record(file)
+        file.write("\n")
+        self.provide_percentile(file)
+        file.write("\n")
+        self.provide_budget(file)
+        file.write("\n")
+        self.provide_win(file)
+        file.write("\n")
+        self.provide_report(file)
+
+    def provide_call(self, file):
+        file.write("\tvoid hedgeCall(HedgeCall call) {\n")
+        file.write("\t\tint startedAt = nowMs()\n")
+        file.write("\t\tcall.response = callBalanced(call.remote, call.request)\n")
+        file.write("\t\tif(call.response != null) recordLatency(nowMs() - startedAt)\n")
+        file.write("\t\tcall.done = true\n")
+        file.write("\t\tcall.waiter.signal()\n")
+        file.write("\t}\n")
+
+    def provide_alarm(self, file):
+        # one sleep for the whole hedge delay, no wakeup when the primary is already done
+        file.write("\tvoid hedgeAlarm(HedgeCall primary, int delay) {\n")
+        file.write("\t\ttimer.sleep(delay)\n")
+        file.write("\t\tif(primary.done) return\n")
+        file.write("\t\tprimary.late = true\n")
+        file.write("\t\tprimary.waiter.signal()\n")
+        file.write("\t}\n")
+
+    def provide_backup(self, file):
+        # the backup must not land on the remote that is already stalling
+        file.write("\tint pickBackupRemote(int primary) {\n")
+        file.write("\t\tint index = pickRemote()\n")
+        file.write("\t\tif(index != primary) return index\n")
+        file.write("\t\tmutex(pointerLock) {\n")
+        file.write("\t\t\tremoteStats[index].inFlight--\n")
+        if self.membership is not None:
+            # the least loaded other active remote, the primary again when it is the only active one
+            file.write("\t\t\tfor(int i = 1; i < remotes.arrayLength; i++) {\n")
+            file.write("\t\t\t\tint candidate = (primary + i) % remotes.arrayLength\n")
+            file.write("\t\t\t\tif(remoteActive[candidate] && (index == primary || remoteStats[candidate].inFlight < remoteStats[index].inFlight)) index = candidate\n")
+            file.write("\t\t\t}\n")
+        else: file.write("\t\t\tindex = (index + 1) % remotes.arrayLength\n")
+        file.write("\t\t\tremoteStats[index].inFlight++\n")
+        file.write("\t\t}\n")
+        file.write("\t\treturn index\n")
+        file.write("\t}\n")
+
+    def provide_delay(self, file):
+        # called once per distributed call, so it also counts the calls the hedge budget is based on
+        file.write("\tint hedgeDelay() {\n")
+        file.write("\t\tmutex(hedgeLock) {\n")
+        file.write("\t\t\thedgeCalls++\n")
+        file.write("\t\t\tif(HEDGE_STATS_EVERY > 0 && hedgeCalls % HEDGE_STATS_EVERY == 0) reportHedging()\n")
+        file.write("\t\t\tif(HEDGE_DELAY > 0) return HEDGE_DELAY\n")
+        file.write("\t\t\treturn hedgeThreshold\n")
+        file.write("\t\t}\n")
+        file.write("\t}\n")
+
+    def provide_record(self, file):
+        file.write("\tvoid recordLatency(int latency) {\n")
+        file.write("\t\tmutex(hedgeLock) {\n")
+        file.write("\t\t\thedgeLatencies[hedgeLatencyPointer] = latency\n")
+        file.write("\t\t\thedgeLatencyPointer = (hedgeLatencyPointer + 1) % hedgeLatencies.arrayLength\n")
+        file.write("\t\t\tif(hedgeSamples < hedgeLatencies.arrayLength) hedgeSamples++\n")
+        file.write(f"\t\t\tif(HEDGE_DELAY == 0 && hedgeLatencyPointer % {HEDGE_REFRESH} == 0) hedgeThreshold = latencyPercentile(HEDGE_PERCENTILE)\n")
+        file.write("\t\t}\n")
+        file.write("\t}\n")
+
+    def provide_percentile(self, file):
+        # callers hold hedgeLock, insertion sort is fine for the small latency window
+        file.write("\tint latencyPercentile(int percent) {\n")
+        file.write("\t\tint sorted[] = new int[hedgeSamples]\n")
+        file.write("\t\tfor(int i = 0; i < hedgeSamples; i++) {\n")
+        file.write("\t\t\tint value = hedgeLatencies[i]\n")
+        file.write("\t\t\tint j = i\n")
+        file.write("\t\t\twhile(j > 0 && sorted[j - 1] > value) {\n")
+        file.write("\t\t\t\tsorted[j] = sorted[j - 1]\n")
+        file.write("\t\t\t\tj--\n")
+        file.write("\t\t\t}\n")
+        file.write("\t\t\tsorted[j] = value\n")
+        file.write("\t\t}\n")
+        file.write("\t\tint threshold = sorted[((hedgeSamples - 1) * percent) / 100]\n")
+        file.write("\t\tif(threshold < HEDGE_MIN_DELAY) threshold = HEDGE_MIN_DELAY\n")
+        file.write("\t\treturn threshold\n")
+        file.write("\t}\n")
+
+    def provide_budget(self, file):
+        # keeps the extra load under HEDGE_MAX_PERCENT of the distributed calls
+        file.write("\tbool startHedge() {\n")
+        remote_count = self.membership.get_remote_count() if self.membership is not None else "remotes.arrayLength"
+        file.write(f"\t\tif({remote_count} < 2) return false\n")
+        file.write("\t\tmutex(hedgeLock) {\n")
+        file.write("\t\t\tif((hedgesFired + 1) * 100 > hedgeCalls * HEDGE_MAX_PERCENT) return false\n")
+        file.write("\t\t\thedgesFired++\n")
+        file.write("\t\t}\n")
+        file.write("\t\treturn true\n")
+        file.write("\t}\n")
+
+    def provide_win(self, file):
+        file.write("\tvoid recordHedgeWin() {\n")
+        file.write("\t\tmutex(hedgeLock) {\n")
+        file.write("\t\t\thedgesWon++\n")
+        file.write("\t\t}\n")
+        file.write("\t}\n")
+
+    def provide_report(self, file):
+        file.write("\tvoid reportHedging() {\n")
+        file.write("\t\tout.println(\"[@Proxy] hedging calls=$(iu.makeString(hedgeCalls)) fired=$(iu.makeString(hedgesFired)) won=$(iu.makeString(hedgesWon)) delay=$(iu.makeString(hedgeThreshold))\")\n")
+        file.write("\t}\n")
@@ -0,0 +1,217 @@
+
+DEFAULT_REFRESH_MS = 5000
+# overrides the path or url of the DIDL when set in the environment of the proxy
+MEMBERSHIP_SOURCE_VARIABLE = "PROXY_MEMBERSHIP_SOURCE"
+MEMBERSHIP_SOURCES = ["file", "registry"]
+
+MEMBERSHIP_DEPENDENCIES = {
+    "file": [
+        { "lib": "io.File", "alias": "" },
+        { "lib": "io.FileSystem", "alias": "fileSystem" },
+    ],
+    "registry": [
+        { "lib": "net.http.Header", "alias": None },
+        { "lib": "net.http.HTTPRequest", "alias": "membershipHttp" },
+    ],
+}
+
+MEMBERSHIP_COMMON_DEPENDENCIES = [
+    { "lib": "io.Output", "alias": "out" },
+    { "lib": "time.Timer", "alias": "timer" },
+    { "lib": "os.SystemInfo", "alias": "sysInfo" },
+]
+
+# body of readMembership() for each source, both return the listing or null when it can not be read
+MEMBERSHIP_READERS = {
+    "file": "\t\tif(!fileSystem.exists(source)) return null\n\t\tFile fd = new File(source, File.READ)\n\t\tbyte content[] = fd.read(fd.getSize())\n\t\tfd.close()\n\t\treturn content\n",
+    "registry": "\t\tHTTPResponse response = membershipHttp.get(source, new Header[](new Header(\"Accept\", \"text/plain\")), false)\n\t\tif(response == null || response.responseCode != \"200\") return null\n\t\treturn response.content\n",
+}
+
+# broadcast writes and primary reads address the current members instead of every index
+MEMBERS_WRITE = ("ReplicaCall calls[] = new ReplicaCall[remotes.arrayLength]\n\t\tfor(int i = 0; i < calls.arrayLength; i++) {\n\t\t\tcalls[i] = new ReplicaCall(i, r)\n\t\t\tclaimRemote(i)",
+                 "int members[] = activeRemotes()\n\t\tReplicaCall calls[] = new ReplicaCall[members.arrayLength]\n\t\tfor(int i = 0; i < calls.arrayLength; i++) {\n\t\t\tcalls[i] = new ReplicaCall(members[i], r)\n\t\t\tclaimRemote(members[i])")
+MEMBERS_PRIMARY = ("\t\tclaimRemote(0)\n\t\treturn callBalanced(0, r)",
+                   "\t\tint primary = activeRemotes()[0]\n\t\tclaimRemote(primary)\n\t\treturn callBalanced(primary, r)")
+
+class MembershipGenerator:
+    def __init__(self, membership_config):
+        # the remotes of the DIDL are the first members, the source then replaces them every refreshMs
+        self.source = membership_config.get('source')
+        self.refresh = membership_config.get('refreshMs', DEFAULT_REFRESH_MS)
+        if self.source not in MEMBERSHIP_SOURCES:
+            raise ValueError(f"unknown membership source '{self.source}', expected one of {', '.join(MEMBERSHIP_SOURCES)}")
+        self.location = membership_config.get('path') if self.source == "file" else membership_config.get('url')
+        if self.location is None:
+            raise ValueError(f"membership source '{self.source}' needs a '{'path' if self.source == 'file' else 'url'}'")
+
+    def get_data_types(self) -> str:
+        return ""
+
+    def get_dependencies(self) -> list:
+        return MEMBERSHIP_DEPENDENCIES[self.source] + MEMBERSHIP_COMMON_DEPENDENCIES
+
+    def get_remote_count(self) -> str:
+        return "activeRemoteCount()"
+
+    def get_inactive_code(self) -> list:
+        # a proxy that was adapted out stops refreshing, the next call after it comes back starts a
+        # new generation and a refresh thread still asleep from the old one exits when it wakes
+        return ["membershipActive = false"]
+
+    def apply_to_strategy(self, code) -> str:
+        for static, members in [MEMBERS_WRITE, MEMBERS_PRIMARY]: code = code.replace(static, members)
+        return code
+
+    def provide_state(self) -> str:
+        # remotes only ever grow, a remote that leaves is marked inactive so calls in flight keep their
+        # index into remotes, remoteStats and the connection pool; one that comes back is reactivated
+        return "\n".join([
+            f"\tconst int MEMBERSHIP_REFRESH = {self.refresh}",
+            f"\tconst char MEMBERSHIP_SOURCE[] = \"{self.location}\"",
+            "\tbool remoteActive[] = null",
+            "\tbool membershipActive = false",
+            "\tint membershipGeneration = 0",
+        ])
+
+    def provide_membership(self, file):
+        self.provide_refresh(file)
+        file.write("\n")
+        self.provide_source(file)
+        file.write("\n")
+        self.provide_read(file)
+        file.write("\n")
+        self.provide_apply(file)
+        file.write("\n")
+        self.provide_parse(file)
+        file.write("\n")
+        self.provide_index(file)
+        file.write("\n")
+        self.provide_members(file)
+        file.write("\n")
+        self.provide_count(file)
+        file.write("\n")
+        self.provide_retire(file)
+
+    def provide_refresh(self, file):
+        file.write("\tvoid refreshMembership(int generation) {\n")
+        file.write("\t\tchar source[] = membershipSource()\n")
+        file.write("\t\twhile(membershipActive && generation == membershipGeneration) {\n")
+        file.write("\t\t\tbyte listing[] = readMembership(source)\n")
+        file.write("\t\t\tif(listing != null) applyMembership(listing)\n")
+        file.write("\t\t\ttimer.sleep(MEMBERSHIP_REFRESH)\n")
+        file.write("\t\t}\n")
+        file.write("\t}\n")
+
+    def provide_source(self, file):
+        file.write("\tchar[] membershipSource() {\n")
+        file.write(f"\t\tchar value[] = sysInfo.getVariable(\"{MEMBERSHIP_SOURCE_VARIABLE}\")\n")
+        file.write("\t\tif(value == null || value.arrayLength == 0) return MEMBERSHIP_SOURCE\n")
+        file.write("\t\treturn value\n")
+        file.write("\t}\n")
+
+    def provide_read(self, file):
+        file.write("\tbyte[] readMembership(char source[]) {\n")
+        file.write(MEMBERSHIP_READERS[self.source])
+        file.write("\t}\n")
+
+    def provide_apply(self, file):
+        # an empty listing keeps the current members, so a registry that just restarted drops no remote
+        file.write("\tvoid applyMembership(byte listing[]) {\n")
+        file.write("\t\tString urls[] = parseMembership(listing)\n")
+        file.write("\t\tif(urls.arrayLength == 0) return\n")
+        file.write("\t\tbool changed = false\n")
+        file.write("\t\tmutex(pointerLock) {\n")
+        file.write("\t\t\tprepareRemoteStats()\n")
+        file.write("\t\t\tbool listed[] = new bool[remotes.arrayLength + urls.arrayLength]\n")
+        file.write("\t\t\tfor(int u = 0; u < urls.arrayLength; u++) {\n")
+        file.write("\t\t\t\tint index = remoteIndex(urls[u].string)\n")
+        file.write("\t\t\t\tif(index == -1) {\n")
+        file.write("\t\t\t\t\tremotes = new HTTPAddress[](remotes, new HTTPAddress(urls[u].string, \"\"))\n")
+        file.write("\t\t\t\t\tindex = remotes.arrayLength - 1\n")
+        file.write("\t\t\t\t\tprepareRemoteStats()\n")
+        file.write("\t\t\t\t\tchanged = true\n")
+        file.write("\t\t\t\t}\n")
+        file.write("\t\t\t\tlisted[index] = true\n")
+        file.write("\t\t\t}\n")
+        file.write("\t\t\tfor(int i = 0; i < remotes.arrayLength; i++) {\n")
+        file.write("\t\t\t\tif(remoteActive[i] != listed[i]) {\n")
+        file.write("\t\t\t\t\tremoteActive[i] = listed[i]\n")
+        file.write("\t\t\t\t\tchanged = true\n")
+        file.write("\t\t\t\t}\n")
+        file.write("\t\t\t}\n")
+        file.write("\t\t}\n")
+        file.write("\t\tif(!changed) return\n")
+        file.write("\t\tcloseRetiredConnections()\n")
+        file.write("\t\tout.println(\"[@Proxy] membership: $(iu.makeString(activeRemoteCount())) of $(iu.makeString(remotes.arrayLength)) remotes active\")\n")
+        file.write("\t}\n")
+
+    def provide_parse(self, file):
+        # one URL per line, blank lines and lines starting with # are skipped
+        file.write("\tString[] parseMembership(byte listing[]) {\n")
+        file.write("\t\tchar text[] = new char[listing.arrayLength]\n")
+        file.write("\t\tfor(int i = 0; i < listing.arrayLength; i++) text[i] = listing[i]\n")
+        file.write("\t\tString lines[] = su.explode(text, \"\\r\\n\")\n")
+        file.write("\t\tString urls[] = null\n")
+        file.write("\t\tfor(int i = 0; i < lines.arrayLength; i++) {\n")
+        file.write("\t\t\tchar url[] = su.trim(lines[i].string)\n")
+        file.write("\t\t\tif(url != null && url.arrayLength > 0 && !su.startsWith(url, \"#\")) urls = new String[](urls, new String(url))\n")
+        file.write("\t\t}\n")
+        file.write("\t\tif(urls == null) return new String[0]\n")
+        file.write("\t\treturn urls\n")
+        file.write("\t}\n")
+
+    def provide_index(self, file):
+        file.write("\tint remoteIndex(char url[]) {\n")
+        file.write("\t\tfor(int i = 0; i < remotes.arrayLength; i++) {\n")
+        file.write("\t\t\tif(remotes[i].url == url) return i\n")
+        file.write("\t\t}\n")
+        file.write("\t\treturn -1\n")
+        file.write("\t}\n")
+
+    def provide_members(self, file):
+        file.write("\tint[] activeRemotes() {\n")
+        file.write("\t\tmutex(pointerLock) {\n")
+        file.write("\t\t\tprepareRemoteStats()\n")
+        file.write("\t\t\tint members[] = new int[countActiveRemotes()]\n")
+        file.write("\t\t\tint count = 0\n")
+        file.write("\t\t\tfor(int i = 0; i < remotes.arrayLength; i++) {\n")
+        file.write("\t\t\t\tif(remoteActive[i]) {\n")
+        file.write("\t\t\t\t\tmembers[count] = i\n")
+        file.write("\t\t\t\t\tcount++\n")
+        file.write("\t\t\t\t}\n")
+        file.write("\t\t\t}\n")
+        file.write("\t\t\treturn members\n")
+        file.write("\t\t}\n")
+        file.write("\t}\n")
+
+    def provide_count(self, file):
+        file.write("\tint activeRemoteCount() {\n")
+        file.write("\t\tmutex(pointerLock) {\n")
+        file.write("\t\t\treturn countActiveRemotes()\n")
+        file.write("\t\t}\n")
+        file.write("\t}\n")
+        file.write("\n")
+        # callers hold pointerLock
+        file.write("\tint countActiveRemotes() {\n")
+        file.write("\t\tif(remoteActive == null) return remotes.arrayLength\n")
+        file.write("\t\tint count = 0\n")
+        file.write("\t\tfor(int i = 0; i < remoteActive.arrayLength; i++) {\n")
+        file.write("\t\t\tif(remoteActive[i]) count++\n")
+        file.write("\t\t}\n")
+        file.write("\t\treturn count\n")
+        file.write("\t}\n")
+
+    def provide_retire(self, file):
+        # idle connections of inactive remotes are closed, busy ones finish their call and are closed
+        # by the next change or by the idle timeout
+        file.write("\tvoid closeRetiredConnections() {\n")
+        file.write("\t\tmutex(poolLock) {\n")
+        file.write("\t\t\tif(pooledLinks == null) return\n")
+        file.write("\t\t\tfor(int i = 0; i < pooledLinks.arrayLength; i++) {\n")
+        file.write("\t\t\t\tif(!remoteActive[i / POOL_PER_REMOTE] && !pooledBusy[i] && pooledLinks[i] != null) {\n")
+        file.write("\t\t\t\t\tpooledLinks[i].disconnect()\n")
+        file.write("\t\t\t\t\tpooledLinks[i] = null\n")
+        file.write("\t\t\t\t}\n")
+        file.write("\t\t\t}\n")
+        file.write("\t\t}\n")
+        file.write("\t}\n")
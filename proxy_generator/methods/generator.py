@@ -1,9 +1,15 @@
 import re
+from codec.generator import CodecGenerator, uses_codec
+from cache.generator import OperandCacheGenerator, OPERAND_MISSING_STATUS, OPERAND_META_PREFIX, cacheable_parameters, uses_operand_cache, provide_hash_helpers
+from strategy.generator import resolve_strategy, strategy_call
+from batching.generator import batched_call
 
 METHOD_TABS = '\t\t'
 
 class MethodsGenerator:
-    def __init__(self, methods, interface_name, attributes, component_implementations):
+    def __init__(self, methods, interface_name, attributes, component_implementations, remote_count="remotes.arrayLength"):
+        # expression for the number of remotes a scattered call is split over
+        self.remote_count = remote_count
         self.methods = methods
         self.interface_name = interface_name
         self.attributes = attributes
@@ -12,12 +18,28 @@ class MethodsGenerator:
     def provide_method_implementation(self, file):
         self.provide_methods(file)
         self.provide_metadata_factory(file)
+        if self.uses_strategy('scatter'): self.provide_row_slicer(file)
+        if self.uses_remotes():
+            file.write("\n")
+            provide_hash_helpers(file)
+        if uses_operand_cache(self.methods):
+            file.write("\n")
+            OperandCacheGenerator().provide_proxy_helpers(file)
+        if uses_codec(self.methods):
+            file.write("\n")
+            CodecGenerator().provide_functions(file)
+
+    def uses_remotes(self) -> bool:
+        return any(self.methods[method].get('strategy', 'local') not in ['local', 'none'] for method in self.methods)
+
+    def uses_strategy(self, strategy) -> bool:
+        return any(self.methods[method].get('strategy') == strategy for method in self.methods)
 
     def provide_methods(self, file):
         for method in self.methods:
             method_props = self.methods[method]
 
-            builder = MethodBuilder(method, method_props, self.interface_name, file)
+            builder = MethodBuilder(method, method_props, self.interface_name, file, self.remote_count)
             builder.look_on_arguments()
             if method_props['strategy'] == 'local':
                 escaped_return_type = re.escape(method_props['returnType'])
@@ -33,7 +55,7 @@ class MethodsGenerator:
                 method_implementation_code = re.search(pattern, self.component_implementations)
                 if method_implementation_code: builder.generate_method_code(method, method_props,
                                                                             component_code=method_implementation_code.group(1))
-            else:
+            elif method_props['strategy'] != 'none':
                 builder.generate_method_code(method, method_props)
 
             file.write("\t}\n")
@@ -45,9 +67,14 @@ class MethodsGenerator:
     def provide_metadata_factory(self, file):
         file.write("""\tMetadata[] buildMetaForMethod(char method[]) {\n\t\tMetadata metaMethod = new Metadata("method", method)\n\t\treturn new Metadata[](metaMethod)\n\t}\n""")
 
+    def provide_row_slicer(self, file):
+        file.write("\n")
+        file.write("""\tMatrix sliceRows(Matrix source, int start, int count) {\n\t\tint end = start + count\n\t\tif(end > source.lines.arrayLength) end = source.lines.arrayLength\n\t\tMatrix block = new Matrix(new Line[end - start])\n\t\tfor(int i = start; i < end; i++) block.lines[i - start] = source.lines[i]\n\t\treturn block\n\t}\n""")
+
 class MethodBuilder:
-    def __init__(self, name, props, interface_name, file):
+    def __init__(self, name, props, interface_name, file, remote_count="remotes.arrayLength"):
         self.name = name
+        self.remote_count = remote_count
         self.props = props
         self.interface_name = interface_name
         self.file = file
@@ -72,28 +99,29 @@ class MethodBuilder:
         if component_code != None:
             self.file.write(component_code)
             self.file.write("\n")
-        elif 'strategy' in props and props['strategy'] == 'distribute':
+        elif 'strategy' in props and props['strategy'] == 'scatter':
+            self.generate_scatter_code(method_name, props)
+        elif 'strategy' in props and resolve_strategy(props) == 'distribute':
             param_format_name = method_name[0].upper() + method_name[1:]
-            params_formatter = f'{param_format_name}ParamsFormat params = new {param_format_name}ParamsFormat('
-            for index, param in enumerate(props['parameters'] if 'parameters' in props else []):
-                if 'stringParser' in param: params_formatter += param['stringParser'].format(
-                    param['useFormat'] if 'useFormat' in param else param['name'])
-                else:
-                    params_formatter += param['name']
-                
-                if index != len(props['parameters']) - 1: params_formatter += ', '
-            params_formatter += ")\n"
+            cached = cacheable_parameters(props)
+            self.write_lines(self.provide_operand_setup(method_name, cached))
 
-            self.file.write(METHOD_TABS)
-            self.file.write(params_formatter)
-            self.file.write(METHOD_TABS)
-            self.file.write("char requestBody[] = je.jsonFromData(params)\n")
-            self.file.write(METHOD_TABS)
-            self.file.write('Request req = new Request(buildMetaForMethod("{}"), requestBody)\n'.format(method_name))
-            self.file.write(METHOD_TABS)
-            self.file.write("Response res = {}(req)\n".format(props['strategy']))
-            self.file.write(METHOD_TABS)
-            self.file.write("return {}\n".format(props['returnParser'].format('res.content') if 'returnParser' in props else 'res.content'))
+            self.write_lines([
+                "{0}ParamsFormat params = new {0}ParamsFormat({1})".format(param_format_name, ", ".join(self.format_parameters(props, {
+                    param['name']: '""' for param in cached}))),
+                "char requestBody[] = je.jsonFromData(params)",
+                "Request req = new Request({}, requestBody)".format("meta" if len(cached) > 0 else f'buildMetaForMethod("{method_name}")'),
+                "Response res = {}(req)".format(strategy_call(props, batched_call(method_name, props, 'distribute'))),
+            ])
+            if len(cached) > 0:
+                self.write_lines([
+                    f'if(responseStatus(res) == "{OPERAND_MISSING_STATUS}") {{',
+                    "\tparams = new {0}ParamsFormat({1})".format(param_format_name, ", ".join(self.format_parameters(props, {}))),
+                    "\tres = {}(new Request(meta, je.jsonFromData(params)))".format(strategy_call(props, batched_call(method_name, props, 'distribute'))),
+                    "}",
+                ])
+            self.write_lines([f'requireSuccess(res, "{method_name}")'])
+            self.write_lines(["return {}".format(props['returnParser'].format('res.content') if 'returnParser' in props else 'res.content')])
         else: # read / write operations
             if 'parameters' in props and len(props['parameters']) == 1:
                 self.file.write(METHOD_TABS)
@@ -107,10 +135,9 @@ class MethodBuilder:
                 self.file.write('Request req = new Request(buildMetaForMethod("{}"))\n'.format(method_name))
 
             self.file.write(METHOD_TABS)
-            self.file.write('{}{}{}(req)\n'.format(
+            self.file.write('{}{}(req)\n'.format(
                 'Response res = ' if props['returnType'] != 'void' else '',
-                props['strategy'],
-                props['operation'].capitalize()))
+                strategy_call(props, resolve_strategy(props) + props['operation'].capitalize())))
             
             if props['returnType'] != 'void':
                 self.file.write(METHOD_TABS)
@@ -118,6 +145,113 @@ class MethodBuilder:
                 
 
 
+    def write_lines(self, lines: list):
+        for line in lines:
+            self.file.write(METHOD_TABS)
+            self.file.write(line)
+            self.file.write("\n")
+
+    def format_parameters(self, props, overrides: dict) -> list:
+        formatted = []
+        for param in props['parameters'] if 'parameters' in props else []:
+            if param['name'] in overrides: formatted.append(overrides[param['name']])
+            elif 'stringParser' in param: formatted.append(param['stringParser'].format(param.get('useFormat', param['name'])))
+            else: formatted.append(param['name'])
+        return formatted
+
+    def provide_operand_setup(self, method_name: str, cached: list) -> list:
+        # cacheable operands are only referenced by their hash, an instance is serialized and hashed
+        # the first time it is seen and the connection pool ships it to each remote once; the full
+        # operand is only sent along when a remote still answers that it does not hold it
+        lines = []
+        for param in cached:
+            name = param['name']
+            serialized = param['stringParser'].format(param.get('useFormat', name)) if 'stringParser' in param else name
+            lines += [
+                f"char operandHash{name}[] = operandHash({name})",
+                f"if(operandHash{name} == null) operandHash{name} = keepOperand({name}, {serialized})",
+            ]
+        if len(cached) > 0:
+            operand_meta = ", ".join([f'new Metadata("{OPERAND_META_PREFIX}{param["name"]}", operandHash{param["name"]})' for param in cached])
+            lines.append(f'Metadata meta[] = new Metadata[](buildMetaForMethod("{method_name}"), {operand_meta})')
+        return lines
+
+    def generate_scatter_code(self, method_name: str, props):
+        # splits the scattered matrix parameter in row blocks, sends every block
+        # asynchronously and stitches the partial results back in row order
+        scatter_props = props.get('scatter', {})
+        parameters = props['parameters'] if 'parameters' in props else []
+        scattered = scatter_props.get('parameter', parameters[0]['name'])
+        block_size = scatter_props.get('blockSize', 0)
+        param_format_name = method_name[0].upper() + method_name[1:]
+
+        def format_param(param, value):
+            if 'stringParser' in param: return param['stringParser'].format(value)
+            return value
+
+        cached = [param for param in cacheable_parameters(props) if param['name'] != scattered]
+        lines = self.provide_operand_setup(method_name, cached)
+        meta = "meta" if len(cached) > 0 else f'buildMetaForMethod("{method_name}")'
+        params_values = []
+        full_values = []
+        for param in parameters:
+            if param['name'] == scattered:
+                params_values.append(format_param(param, f"sliceRows({scattered}, k * blockSize, blockSize)"))
+                full_values.append(params_values[-1])
+            elif param in cached:
+                params_values.append('""')
+                full_values.append(f"full{param['name']}")
+            else:
+                lines.append("char shared{}[] = {}".format(param['name'], format_param(param, param.get('useFormat', param['name']))))
+                params_values.append(f"shared{param['name']}")
+                full_values.append(params_values[-1])
+
+        lines += [
+            f"int rows = {scattered}.lines.arrayLength",
+            f"int blockSize = {block_size}",
+            f"int spread = {self.remote_count}",
+            "if(spread < 1) spread = 1",
+            "if(blockSize <= 0) blockSize = (rows + spread - 1) / spread",
+            "if(blockSize <= 0) blockSize = 1",
+            "int blocks = (rows + blockSize - 1) / blockSize",
+            "ScatterCall calls[] = new ScatterCall[blocks]",
+            "Thread workers[] = new Thread[blocks]",
+            "for(int k = 0; k < blocks; k++) {",
+            "\t{0}ParamsFormat params = new {0}ParamsFormat({1})".format(param_format_name, ", ".join(params_values)),
+            "\tchar requestBody[] = je.jsonFromData(params)",
+            '\tcalls[k] = new ScatterCall(k, new Request({}, requestBody))'.format(meta),
+            "\tworkers[k] = asynch::scatter(calls[k])",
+            "}",
+            f"{props['returnType']} result = new {props['returnType']}(new Line[rows])",
+            "for(int k = 0; k < blocks; k++) workers[k].join()",
+        ]
+        if len(cached) > 0:
+            # blocks whose remote still misses an operand are sent again with it, all of them at once
+            lines += [f"char full{param['name']}[] = null" for param in cached] + [
+                "Thread resent[] = new Thread[blocks]",
+                "for(int k = 0; k < blocks; k++) {",
+                f'\tif(responseStatus(calls[k].response) == "{OPERAND_MISSING_STATUS}") {{',
+            ] + [f"\t\tif(full{param['name']} == null) full{param['name']} = {format_param(param, param.get('useFormat', param['name']))}" for param in cached] + [
+                "\t\t{0}ParamsFormat fullParams = new {0}ParamsFormat({1})".format(param_format_name, ", ".join(full_values)),
+                "\t\tcalls[k].request = new Request(meta, je.jsonFromData(fullParams))",
+                "\t\tresent[k] = asynch::scatter(calls[k])",
+                "\t}",
+                "}",
+                "for(int k = 0; k < blocks; k++) {",
+                "\tif(resent[k] != null) resent[k].join()",
+                "}",
+            ]
+        lines += [
+            "for(int k = 0; k < blocks; k++) {",
+            '\trequireSuccess(calls[k].response, "scatter block $(iu.makeString(k)) of {}")'.format(method_name),
+            "\t{} block = {}".format(props['returnType'], props['returnParser'].format('calls[k].response.content') if 'returnParser' in props else 'calls[k].response.content'),
+            "\tfor(int r = 0; r < block.lines.arrayLength; r++) result.lines[(k * blockSize) + r] = block.lines[r]",
+            "}",
+            "return result",
+        ]
+
+        self.write_lines(lines)
+
     def build_request(method_name, content=None) -> str:
         if content == None:
             return "new Request(buildMetaForMethod(\"{}\"))\n".format(method_name)
@@ -0,0 +1,131 @@
+
+DEFAULT_MAX_PER_REMOTE = 4
+DEFAULT_IDLE_TIMEOUT_MS = 30000
+
+POOL_DEPENDENCIES = [
+    { "lib": "network.rpc.RPCUtil", "alias": "" },
+]
+
+class ConnectionPoolGenerator:
+    def __init__(self, pool_config=None, ship_operands=False):
+        pool_config = pool_config if pool_config is not None else {}
+        # with the operand cache a call first ships the operands it references to the remote
+        self.make_call = "makeWithOperands(remote, link, r)" if ship_operands else "link.make(r)"
+        self.max_per_remote = pool_config.get('maxPerRemote', DEFAULT_MAX_PER_REMOTE)
+        self.idle_timeout = pool_config.get('idleTimeoutMs', DEFAULT_IDLE_TIMEOUT_MS)
+
+    def get_data_types(self) -> str:
+        return ""
+
+    def get_dependencies(self) -> list:
+        return POOL_DEPENDENCIES
+
+    def provide_state(self) -> str:
+        # slot (remote * POOL_PER_REMOTE + n) holds the n-th persistent connection of a remote
+        return "\n".join([
+            f"\tconst int POOL_PER_REMOTE = {self.max_per_remote}",
+            f"\tconst int POOL_IDLE_TIMEOUT = {self.idle_timeout}",
+            "\tRPCUtil pooledLinks[] = null",
+            "\tint pooledLastUsed[] = null",
+            "\tbool pooledBusy[] = null",
+            "\tMutex poolLock = new Mutex()",
+        ])
+
+    def provide_pool(self, file):
+        self.provide_call(file)
+        file.write("\n")
+        self.provide_acquire(file)
+        file.write("\n")
+        self.provide_grow(file)
+        file.write("\n")
+        self.provide_release(file)
+        file.write("\n")
+        self.provide_open(file)
+
+    def provide_call(self, file):
+        # the link of a slot is only moved in and out of pooledLinks under poolLock, in between it belongs
+        # to this call; with every slot of the remote busy the call uses a connection of its own. Every
+        # exit goes through releaseConnection, a call that throws gives its slot back with the link closed
+        file.write("\tResponse callRemote(int remote, Request r) {\n")
+        file.write("\t\tint slot = acquireConnection(remote)\n")
+        file.write("\t\tRPCUtil link = null\n")
+        file.write("\t\tbool idle = false\n")
+        file.write("\t\tif(slot != -1) {\n")
+        file.write("\t\t\tmutex(poolLock) {\n")
+        file.write("\t\t\t\tlink = pooledLinks[slot]\n")
+        file.write("\t\t\t\tpooledLinks[slot] = null\n")
+        file.write("\t\t\t\tidle = link != null && nowMs() - pooledLastUsed[slot] > POOL_IDLE_TIMEOUT\n")
+        file.write("\t\t\t}\n")
+        file.write("\t\t}\n")
+        file.write("\t\tResponse res = null\n")
+        file.write("\t\ttry {\n")
+        file.write("\t\t\tif(idle) {\n")
+        file.write("\t\t\t\tlink.disconnect()\n")
+        file.write("\t\t\t\tlink = null\n")
+        file.write("\t\t\t}\n")
+        file.write("\t\t\tif(link == null) link = openConnection(remote)\n")
+        file.write(f"\t\t\tif(link != null) res = {self.make_call}\n")
+        file.write("\t\t\tif(res == null && link != null) {\n")
+        file.write("\t\t\t\tlink.disconnect()\n")
+        file.write("\t\t\t\tlink = openConnection(remote)\n")
+        file.write(f"\t\t\t\tif(link != null) res = {self.make_call}\n")
+        file.write("\t\t\t}\n")
+        file.write("\t\t} catch(Exception e) {\n")
+        file.write("\t\t\tres = null\n")
+        file.write("\t\t}\n")
+        file.write("\t\treleaseConnection(slot, link, res != null)\n")
+        file.write("\t\treturn res\n")
+        file.write("\t}\n")
+
+    def provide_acquire(self, file):
+        # at most POOL_PER_REMOTE connections of a remote stay open, -1 when all of them are in use
+        file.write("\tint acquireConnection(int remote) {\n")
+        file.write("\t\tint slot = -1\n")
+        file.write("\t\tmutex(poolLock) {\n")
+        file.write("\t\t\tif(pooledLinks == null || pooledLinks.arrayLength != remotes.arrayLength * POOL_PER_REMOTE) growPool()\n")
+        file.write("\t\t\tfor(int i = remote * POOL_PER_REMOTE; i < (remote + 1) * POOL_PER_REMOTE; i++) {\n")
+        file.write("\t\t\t\tif(!pooledBusy[i] && (slot == -1 || pooledLinks[i] != null)) slot = i\n")
+        file.write("\t\t\t}\n")
+        file.write("\t\t\tif(slot != -1) pooledBusy[slot] = true\n")
+        file.write("\t\t}\n")
+        file.write("\t\treturn slot\n")
+        file.write("\t}\n")
+
+    def provide_grow(self, file):
+        # callers hold poolLock; remotes are only appended, so the slots of known remotes keep
+        # their connections and the calls holding them release them at the same position
+        file.write("\tvoid growPool() {\n")
+        file.write("\t\tRPCUtil links[] = new RPCUtil[remotes.arrayLength * POOL_PER_REMOTE]\n")
+        file.write("\t\tint lastUsed[] = new int[links.arrayLength]\n")
+        file.write("\t\tbool busy[] = new bool[links.arrayLength]\n")
+        file.write("\t\tfor(int i = 0; pooledLinks != null && i < pooledLinks.arrayLength; i++) {\n")
+        file.write("\t\t\tlinks[i] = pooledLinks[i]\n")
+        file.write("\t\t\tlastUsed[i] = pooledLastUsed[i]\n")
+        file.write("\t\t\tbusy[i] = pooledBusy[i]\n")
+        file.write("\t\t}\n")
+        file.write("\t\tpooledLinks = links\n")
+        file.write("\t\tpooledLastUsed = lastUsed\n")
+        file.write("\t\tpooledBusy = busy\n")
+        file.write("\t}\n")
+
+    def provide_release(self, file):
+        file.write("\tvoid releaseConnection(int slot, RPCUtil link, bool healthy) {\n")
+        file.write("\t\tif(link != null && (!healthy || slot == -1)) {\n")
+        file.write("\t\t\tlink.disconnect()\n")
+        file.write("\t\t\tlink = null\n")
+        file.write("\t\t}\n")
+        file.write("\t\tif(slot == -1) return\n")
+        file.write("\t\tmutex(poolLock) {\n")
+        file.write("\t\t\tpooledLinks[slot] = link\n")
+        file.write("\t\t\tpooledLastUsed[slot] = nowMs()\n")
+        file.write("\t\t\tpooledBusy[slot] = false\n")
+        file.write("\t\t}\n")
+        file.write("\t}\n")
+
+    def provide_open(self, file):
+        # null when the remote cannot be reached
+        file.write("\tRPCUtil openConnection(int remote) {\n")
+        file.write("\t\tRPCUtil link = new RPCUtil()\n")
+        file.write("\t\tif(!link.connect(remotes[remote])) return null\n")
+        file.write("\t\treturn link\n")
+        file.write("\t}\n")
@@ -1,3 +1,8 @@
+from cache.generator import OPERAND_MISSING_STATUS, OPERAND_META_PREFIX, OPERAND_STORE_METHOD, OPERAND_TARGET_META, cacheable_parameters
+from codec.generator import CodecGenerator, get_codec, uses_codec
+from strategy.generator import resolve_strategy
+from workers.generator import RemoteWorkersGenerator
+from batching.generator import BatchingGenerator, batched_methods, BATCH_SUFFIX
 
 def use_identation(func):
     def identation_wrapper(self, *args, **kwargs):
@@ -19,17 +24,21 @@ def use_flow(flow: str):
         return flow_wrapper
     return use_flow_dec
 
-replicated_strategies = ['distribute']
+replicated_strategies = ['distribute', 'scatter']
 
 class RemoteGenerator:
     def __init__(self, file, component_name, component_package,
                  component_methods,
-                 identation_level=0, connection_library="network.rpc.RPCUtil rpc"):
+                 identation_level=0, connection_library="network.rpc.RPCUtil rpc", operand_cache=None, workers=None):
         self.identation_level = identation_level
         self.file = file
         self.component_name = component_name
         self.component_package = component_package
         self.component_methods = component_methods
+        self.operand_cache = operand_cache
+        self.codec = CodecGenerator() if uses_codec(component_methods) else None
+        self.workers = workers if workers is not None else RemoteWorkersGenerator()
+        self.batching = BatchingGenerator(component_methods) if len(batched_methods(component_methods)) > 0 else None
         self.resources = [
             "net.TCPSocket",
             "net.TCPServerSocket",
@@ -39,7 +48,7 @@ class RemoteGenerator:
             "data.StringUtil su",
             connection_library,
             f"{component_package}.{component_name.capitalize()} remoteComponent",
-        ]
+        ] + self.workers.get_resources()
     
     def provide_header(self):
         self.file.write("uses Constants")
@@ -47,6 +56,15 @@ class RemoteGenerator:
         self.file.write('const char debugMSG[] = "[@Remote]"')
         self.break_line()
         self.break_line()
+        if self.operand_cache is not None:
+            self.file.write(self.operand_cache.get_remote_data_types())
+            self.break_line()
+        if self.codec is not None:
+            self.file.write(self.codec.get_data_types())
+            self.break_line()
+        if self.batching is not None:
+            self.file.write(self.batching.get_remote_data_types())
+            self.break_line()
         self.ident()
         self.file.write(f"component provides server.Remote:{self.component_name} {self.provide_component_resources()}" + " {")
         self.improve_identation_level()
@@ -56,6 +74,9 @@ class RemoteGenerator:
 
     def provide_server_methods(self):
         self.write_idented("bool serviceStatus = false")
+        for line in self.workers.get_state(): self.write_idented(line)
+        if self.operand_cache is not None:
+            for line in self.operand_cache.get_remote_state(): self.write_idented(line)
         self.break_line()
         self.provie_init_method()
         self.provide_handle_request()
@@ -71,6 +92,8 @@ class RemoteGenerator:
             "return"
         ])
         self.write_idented('out.println("$debugMSG - Server started on port $(iu.makeString(PORT))")')
+        for line in self.workers.get_setup(): self.write_idented(line)
+        for line in self.provide_settings(): self.write_idented(line)
         self.break_line()
         inside_while = self.use_idented_flow("while (serviceStatus)")
         inside_while(self, [
@@ -78,31 +101,46 @@ class RemoteGenerator:
             "if (client.accept(host)) asynch::handleRequest(client)"
         ])
 
+    def provide_settings(self) -> list:
+        # a method with a remoteSetting receives the integer environment variable before the first request,
+        # an unset variable passes 0
+        return [f'remoteComponent.{method}(envSetting("{props["remoteSetting"]}", 0))'
+                for method, props in self.component_methods.items() if 'remoteSetting' in props]
+
     @use_flow("void Remote:handleRequest(TCPSocket s)")
     def provide_handle_request(self):
-        self.write_idented("char requestContent[] = rpc.receiveData(s)")
-        self.write_idented("if(requestContent == null) s.disconnect()")
-        self.write_idented("Request req = rpc.parseRequestFromString(requestContent)")
-        self.write_idented("Response res = process(req)")
-        self.write_idented("char rawResponse[] = rpc.buildRawResponse(res)")
-        self.write_idented("s.send(rawResponse)")
+        # keep-alive: reads framed requests until the client closes the connection,
+        # the worker pool processes them and answers on this socket
+        inside_while = self.use_idented_flow("while (serviceStatus)")
+        inside_while(self, [
+            "char requestContent[] = rpc.receiveData(s)",
+            "if(requestContent == null) break",
+            "Request req = rpc.parseRequestFromString(requestContent)",
+        ] + self.workers.get_request_handling())
         self.write_idented("s.disconnect()")
 
     @use_flow("Response process(Request req)")
     def provide_processing_method(self):
         self.write_idented("char method[] = rpc.getMethodFromMetadata(req.meta)")
         self.break_line()
+        if self.batching is not None:
+            for line in self.batching.get_remote_dispatch(): self.write_idented(line)
+            self.break_line()
+        if self.operand_cache is not None:
+            self.write_idented(f'if(method == "{OPERAND_STORE_METHOD}") return receiveOperand(req)')
+            self.break_line()
         # methods goes here
         for method in self.component_methods:
             method_configs = self.component_methods[method]
             # print(method_configs)
-            if method_configs["strategy"] in replicated_strategies:
+            if resolve_strategy(method_configs) in replicated_strategies:
                 inside_strategy = self.use_idented_flow(f'if(method == "{method}")')
                 parameters_format_type = f"{method[0].upper() + method[1:]}ParamsFormat"
                 inside_strategy(self, [
                     f"{parameters_format_type} paramsData = je.jsonToData(req.content, typeof({parameters_format_type}))",
+                ] + self.provide_operand_resolution(method, method_configs) + [
                     f"{method_configs['returnType']} result = remoteComponent.{method}({self.provide_virables_for_method(method_configs)})",
-                    f'return rpc.buildResponseWithData("{method}", "200", remoteComponent.{method_configs["remoteReturnParser"].format("result")})'
+                    f'return rpc.buildResponseWithData("{method}", "200", {self.provide_return_for_method(method_configs)})'
                 ])
 
         # finish methods
@@ -112,9 +150,89 @@ class RemoteGenerator:
 
     def provide_virables_for_method(self, method_config) -> str:
         def get_formated_parser(param):
-            return param['variableParser'].format(f"paramsData.{param['name']}")
+            if self.operand_cache is not None and param.get('cacheable', False): return f"operand{param['name']}"
+            return self.provide_parser_for_parameter(param, f"paramsData.{param['name']}")
+
+        return ",".join([get_formated_parser(param) for param in method_config['parameters']])
+
+    def provide_parser_for_parameter(self, param, value) -> str:
+        # codec decoders are generated inside this component, text parsers belong to the remote component
+        if 'codec' in param: return get_codec(param['codec'], param['type'])['decoder'].format(value)
+        return "remoteComponent." + param['variableParser'].format(value)
+
+    def provide_return_for_method(self, method_config) -> str:
+        if 'returnCodec' in method_config:
+            return get_codec(method_config['returnCodec'], method_config['returnType'])['encoder'].format("result")
+        return "remoteComponent." + method_config["remoteReturnParser"].format("result")
+
+    def provide_operand_resolution(self, method, method_config) -> list:
+        # a cacheable parameter arrives either with its content, which is parsed and
+        # cached under the hash sent in the metadata, or empty, referencing the hash only
+        if self.operand_cache is None: return []
+        lines = []
+        for param in cacheable_parameters(method_config):
+            name = param['name']
+            lines += [
+                f'char operandHash{name}[] = getMetadata(req.meta, "{OPERAND_META_PREFIX}{name}")',
+                f"{param['type']} operand{name} = null",
+                f"if(paramsData.{name} != null && paramsData.{name}.arrayLength > 0) {{",
+                f"\toperand{name} = {self.provide_parser_for_parameter(param, f'paramsData.{name}')}",
+                f"\tstoreOperand(operandHash{name}, operand{name})",
+                "} else {",
+                f"\toperand{name} = loadOperand(operandHash{name})",
+                f'\tif(operand{name} == null) return rpc.buildResponse("{method}", "{OPERAND_MISSING_STATUS}")',
+                "}",
+            ]
+        return lines
+
+    def provide_worker_methods(self):
+        for signature, lines in self.workers.get_functions():
+            self.use_idented_flow(signature)(self, lines)
+
+    def provide_codec_methods(self):
+        if self.codec is None: return
+        for signature, lines in self.codec.get_functions():
+            self.use_idented_flow(signature)(self, lines)
+
+    def provide_batch_methods(self):
+        if self.batching is None: return
+        for signature, lines in self.batching.get_remote_functions():
+            self.use_idented_flow(signature)(self, lines)
+
+    def provide_operand_cache_methods(self):
+        if self.operand_cache is not None or self.batching is not None:
+            self.use_idented_flow("char[] getMetadata(Metadata meta[], char name[])")(self, [
+                "for(int i = 0; i < meta.arrayLength; i++) {",
+                "\tif(meta[i].name == name) return meta[i].value",
+                "}",
+                "return null",
+            ])
+        if self.operand_cache is None: return
+        self.use_idented_flow("Data loadOperand(char hash[])")(self, self.operand_cache.get_remote_load())
+        self.use_idented_flow("void storeOperand(char hash[], Data value)")(self, self.operand_cache.get_remote_store())
+        self.use_idented_flow("Response receiveOperand(Request req)")(self, self.provide_operand_receiving())
 
-        return ",".join([f"remoteComponent.{get_formated_parser(param)}" for param in method_config['parameters']])
+    def provide_operand_receiving(self) -> list:
+        # an operand shipped ahead of the calls of a method is parsed the way that method parses it
+        lines = [f'char target[] = getMetadata(req.meta, "{OPERAND_TARGET_META}")']
+        for method, method_config in self.component_methods.items():
+            cached = cacheable_parameters(method_config)
+            if resolve_strategy(method_config) not in replicated_strategies or len(cached) == 0: continue
+            condition = f'target == "{method}"'
+            if method in batched_methods(self.component_methods): condition += f' || target == "{method}{BATCH_SUFFIX}"'
+            lines.append(f"if({condition}) {{")
+            for param in cached:
+                name = param['name']
+                lines += [
+                    f'\tchar operandHash{name}[] = getMetadata(req.meta, "{OPERAND_META_PREFIX}{name}")',
+                    f"\tif(operandHash{name} != null) {{",
+                    f"\t\tstoreOperand(operandHash{name}, {self.provide_parser_for_parameter(param, 'req.content')})",
+                    f'\t\treturn rpc.buildResponse("{OPERAND_STORE_METHOD}", "200")',
+                    "\t}",
+                ]
+            lines.append("}")
+        lines.append(f'return rpc.buildResponse("{OPERAND_STORE_METHOD}", "404")')
+        return lines
 
     @use_identation
     def write_idented(self, line: str):
@@ -1,34 +1,140 @@
+from workers.generator import REMOTE_BUSY_STATUS
+
 STRATEGIES_CODE = {
     "broadcast": {
-        "write": """\t\tfor(int i = 0; i < remotes.arrayLength; i++) {\n\t\t\tconnection.connect(remotes[i])\n\t\t\tconnection.make(r)\n\t\t}\n""",
-        "read": """\t\tconnection.connect(remotes[0])\n\t\treturn connection.make(r)\n"""
+        "write": """\t\tReplicaCall calls[] = new ReplicaCall[remotes.arrayLength]\n\t\tfor(int i = 0; i < calls.arrayLength; i++) {\n\t\t\tcalls[i] = new ReplicaCall(i, r)\n\t\t\tclaimRemote(i)\n\t\t\tasynch::replicaCall(calls[i])\n\t\t}\n\t\tint needed = {quorum}\n\t\twhile(true) {\n\t\t\tint acked = 0\n\t\t\tint pending = 0\n\t\t\tfor(int i = 0; i < calls.arrayLength; i++) {\n\t\t\t\tif(!calls[i].done) pending++\n\t\t\t\telse if(calls[i].response != null) acked++\n\t\t\t}\n\t\t\tif(acked >= needed) return\n\t\t\tif(pending == 0) throw new Exception("broadcast write acknowledged by $(iu.makeString(acked)) of $(iu.makeString(needed)) replicas")\n\t\t\ttimer.sleep(1)\n\t\t}\n""",
+        "read": """{read}\n"""
+    },
+    "distribute": "\t\treturn callBalanced(pickRemote(), r)\n",
+    "scatter": {
+        "signature": "void scatter(ScatterCall call)",
+        "code": "\t\tcall.response = callBalanced(pickRemote(), call.request)\n"
     },
-    "distribute": "\t\tconnection.connect(remotes[addressPointer])\n\t\tmutex(pointerLock) {\n\t\t\taddressPointer++\n\t\t\tif(addressPointer >= remotes.arrayLength) addressPointer = 0\n\t\t}\n\t\treturn connection.make(r)\n",
 }
 
+# replicas a broadcast write waits for, stragglers finish in the background
+BROADCAST_QUORUMS = {
+    "all": "calls.arrayLength",
+    "majority": "(calls.arrayLength / 2) + 1",
+    "one": "1",
+}
+
+BROADCAST_READS = {
+    "primary": "\t\tclaimRemote(0)\n\t\treturn callBalanced(0, r)",
+    "fastest": "\t\treturn callBalanced(pickFastestRemote(), r)",
+}
+
+# helper run asynchronously for every replica of a broadcast write, a write must reach its own
+# replica so a busy one is not retried elsewhere and does not count as an acknowledgement
+BROADCAST_REPLICA_CALL = "\tvoid replicaCall(ReplicaCall call) {\n\t\tint startedAt = nowMs()\n\t\tcall.response = callRemote(call.remote, call.request)\n\t\tif(responseStatus(call.response) == \"%s\") call.response = null\n\t\treleaseRemote(call.remote, nowMs() - startedAt, call.response == null)\n\t\tcall.done = true\n\t}\n" % REMOTE_BUSY_STATUS
+
+# data types used by a strategy, declared before the component
+STRATEGIES_DATA = {
+    "broadcast": "data ReplicaCall {\n\tint remote\n\tRequest request\n\tResponse response\n\tbool done\n}\n",
+    "scatter": "data ScatterCall {\n\tint index\n\tRequest request\n\tResponse response\n}\n",
+}
+
+# strategies a `cached` method may wrap, the wrapped call is answered from the response cache
+CACHEABLE_STRATEGIES = ['distribute', 'broadcast']
+CACHED_STRATEGY = "cached"
+
+def resolve_strategy(props) -> str:
+    # strategy that actually reaches the remotes, looking through a `cached` wrapper
+    if props.get('strategy') != CACHED_STRATEGY: return props.get('strategy')
+    inner = props.get(CACHED_STRATEGY, {}).get('strategy', 'distribute')
+    if inner not in CACHEABLE_STRATEGIES:
+        raise ValueError(f"strategy '{inner}' can not be cached, expected one of {', '.join(CACHEABLE_STRATEGIES)}")
+    return inner
+
+def strategy_call(props, call) -> str:
+    if props.get('strategy') != CACHED_STRATEGY: return call
+    return CACHED_STRATEGY + call[0].upper() + call[1:]
+
 class StrategyGenerator():
-    def __init__(self, strategies):
+    def __init__(self, strategies, cached_strategies=None, hedging=None, broadcast_config=None, membership=None):
         self.strategies = strategies
+        self.membership = membership
+        self.cached_strategies = cached_strategies if cached_strategies is not None else set()
+        self.hedging = hedging
+        broadcast_config = broadcast_config if broadcast_config is not None else {}
+        self.quorum = broadcast_config.get('quorum', 'all')
+        self.read = broadcast_config.get('read', 'primary')
+        if self.quorum not in BROADCAST_QUORUMS:
+            raise ValueError(f"unknown broadcast quorum '{self.quorum}', expected one of {', '.join(BROADCAST_QUORUMS)}")
+        if self.read not in BROADCAST_READS:
+            raise ValueError(f"unknown broadcast read '{self.read}', expected one of {', '.join(BROADCAST_READS)}")
+
+    def uses_remotes(self) -> bool:
+        return any(strategy in STRATEGIES_CODE for strategy in self.strategies)
+
+    def get_data_types(self) -> str:
+        return "\n".join([STRATEGIES_DATA[strategy] for strategy in sorted(self.strategies) if strategy in STRATEGIES_DATA])
 
     def provide_strategy(self, file):
-        for strategy in self.strategies:
+        provided = 0
+        for strategy in sorted(self.strategies):
             if strategy in STRATEGIES_CODE and strategy != 'local':
-                if 'write' in STRATEGIES_CODE[strategy] and 'read' in STRATEGIES_CODE[strategy]:
+                if provided > 0: file.write("\n")
+                provided += 1
+
+                if 'signature' in STRATEGIES_CODE[strategy]:
+                    file.write("\t{} ".format(STRATEGIES_CODE[strategy]["signature"]) + "{\n")
+                    file.write(STRATEGIES_CODE[strategy]["code"])
+                    file.write("\t}\n")
+                elif 'write' in STRATEGIES_CODE[strategy] and 'read' in STRATEGIES_CODE[strategy]:
                     write_strategy_method_name = "{}Write".format(strategy)
                     read_strategy_method_name = "{}Read".format(strategy)
 
                     #write writeStrategy
                     file.write("\tvoid {}(Request r) ".format(write_strategy_method_name) + "{\n")
-                    file.write(STRATEGIES_CODE[strategy]["write"])
+                    file.write(self.apply_membership(STRATEGIES_CODE[strategy]["write"].replace("{quorum}", BROADCAST_QUORUMS[self.quorum])))
                     file.write("\t}\n")
 
                     file.write("\n")
 
                     # write readStrategy
                     file.write("\tResponse {}(Request r) ".format(read_strategy_method_name) + "{\n")
-                    file.write(STRATEGIES_CODE[strategy]["read"])
+                    file.write(self.apply_membership(STRATEGIES_CODE[strategy]["read"].replace("{read}", BROADCAST_READS[self.read])))
                     file.write("\t}\n")
+
+                    if strategy == 'broadcast':
+                        file.write("\n")
+                        file.write(BROADCAST_REPLICA_CALL)
                 else:
                     file.write("\tResponse {}(Request r) ".format(strategy) + "{\n")
-                    file.write(STRATEGIES_CODE[strategy])
-                    file.write("\t}\n")
\ No newline at end of file
+                    if strategy == 'distribute' and self.hedging is not None: file.write(self.hedging.get_distribute_code())
+                    else: file.write(STRATEGIES_CODE[strategy])
+                    file.write("\t}\n")
+
+        for strategy in sorted(self.cached_strategies):
+            if provided > 0: file.write("\n")
+            provided += 1
+            self.provide_cached_strategy(file, strategy)
+
+    def apply_membership(self, code) -> str:
+        if self.membership is None: return code
+        return self.membership.apply_to_strategy(code)
+
+    def provide_cached_strategy(self, file, strategy):
+        # strategy is a strategy of STRATEGIES_CODE or the coalescing call of a batched method
+        if strategy in STRATEGIES_CODE and 'write' in STRATEGIES_CODE[strategy] and 'read' in STRATEGIES_CODE[strategy]:
+            # writes are never cached and drop every cached response, since they may change what reads return;
+            # the second clear drops what reads running during the write stored from the old state
+            file.write("\tvoid {}(Request r) ".format(strategy_call({'strategy': CACHED_STRATEGY}, f"{strategy}Write")) + "{\n")
+            file.write("\t\tclearResponses()\n")
+            file.write(f"\t\t{strategy}Write(r)\n")
+            file.write("\t\tclearResponses()\n")
+            file.write("\t}\n")
+            file.write("\n")
+            call = f"{strategy}Read"
+        else:
+            call = strategy
+
+        file.write("\tResponse {}(Request r) ".format(strategy_call({'strategy': CACHED_STRATEGY}, call)) + "{\n")
+        file.write("\t\tchar key[] = requestKey(r)\n")
+        file.write("\t\tResponse res = lookupResponse(key, r.content)\n")
+        file.write("\t\tif(res != null) return res\n")
+        file.write(f"\t\tres = {call}(r)\n")
+        file.write('\t\tif(responseStatus(res) == "200") storeResponse(key, r.content, res)\n')
+        file.write("\t\treturn res\n")
+        file.write("\t}\n")
@@ -0,0 +1,107 @@
+
+# status answered by the remote when its work queue is full, the proxy retries the call on another remote
+REMOTE_BUSY_STATUS = "503"
+DEFAULT_POOL_SIZE = 4
+DEFAULT_QUEUE_DEPTH = 64
+POOL_SIZE_VARIABLE = "REMOTE_POOL_SIZE"
+QUEUE_DEPTH_VARIABLE = "REMOTE_QUEUE_DEPTH"
+
+class RemoteWorkersGenerator:
+    # remote side: a fixed number of workers drain a bounded queue of received requests
+    def __init__(self, workers_config=None):
+        workers_config = workers_config if workers_config is not None else {}
+        self.pool_size = workers_config.get('poolSize', DEFAULT_POOL_SIZE)
+        self.queue_depth = workers_config.get('queueDepth', DEFAULT_QUEUE_DEPTH)
+
+    def get_resources(self) -> list:
+        return ["os.SystemInfo sysInfo"]
+
+    def get_state(self) -> list:
+        # queued requests live in parallel rings, a worker answers on the socket the request came from
+        return [
+            f"int workerLimit = {self.pool_size}",
+            f"int queueLimit = {self.queue_depth}",
+            "TCPSocket workSockets[] = null",
+            "Request workRequests[] = null",
+            "int workHead = 0",
+            "int workCount = 0",
+            "int activeWorkers = 0",
+            "int rejectedRequests = 0",
+            "Mutex workLock = new Mutex()",
+        ]
+
+    def get_setup(self) -> list:
+        return [
+            f'workerLimit = envSetting("{POOL_SIZE_VARIABLE}", workerLimit)',
+            f'queueLimit = envSetting("{QUEUE_DEPTH_VARIABLE}", queueLimit)',
+            "workSockets = new TCPSocket[workerLimit + queueLimit]",
+            "workRequests = new Request[workSockets.arrayLength]",
+            'out.println("$debugMSG - $(iu.makeString(workerLimit)) workers, queue depth $(iu.makeString(queueLimit))")',
+        ]
+
+    def get_request_handling(self) -> list:
+        return [
+            "if(!submitWork(s, req)) {",
+            f'\tchar rawBusy[] = rpc.buildRawResponse(rpc.buildResponse(rpc.getMethodFromMetadata(req.meta), "{REMOTE_BUSY_STATUS}"))',
+            "\tif(s.send(rawBusy) != rawBusy.arrayLength) break",
+            "}",
+        ]
+
+    def get_functions(self) -> list:
+        return [
+            ("int envSetting(char name[], int fallback)", [
+                "char value[] = sysInfo.getVariable(name)",
+                "if(value == null || value.arrayLength == 0) return fallback",
+                "return iu.intFromString(value)",
+            ]),
+            # spawns a worker while fewer than workerLimit are running, rejects once the queue is full
+            ("bool submitWork(TCPSocket s, Request req)", [
+                "bool spawn = false",
+                "mutex(workLock) {",
+                "\tif(workCount == workSockets.arrayLength || (workCount >= queueLimit && activeWorkers >= workerLimit)) {",
+                "\t\trejectedRequests++",
+                "\t\treturn false",
+                "\t}",
+                "\tint tail = (workHead + workCount) % workSockets.arrayLength",
+                "\tworkSockets[tail] = s",
+                "\tworkRequests[tail] = req",
+                "\tworkCount++",
+                "\tif(activeWorkers < workerLimit) {",
+                "\t\tactiveWorkers++",
+                "\t\tspawn = true",
+                "\t}",
+                "}",
+                "if(spawn) asynch::runWorker()",
+                "return true",
+            ]),
+            # a worker leaves as soon as it finds the queue empty, the next submit spawns a new one
+            ("void runWorker()", [
+                "while(true) {",
+                "\tTCPSocket s = null",
+                "\tRequest req = null",
+                "\tmutex(workLock) {",
+                "\t\tif(workCount == 0) {",
+                "\t\t\tactiveWorkers--",
+                "\t\t\treturn",
+                "\t\t}",
+                "\t\ts = workSockets[workHead]",
+                "\t\treq = workRequests[workHead]",
+                "\t\tworkSockets[workHead] = null",
+                "\t\tworkRequests[workHead] = null",
+                "\t\tworkHead = (workHead + 1) % workSockets.arrayLength",
+                "\t\tworkCount--",
+                "\t}",
+                "\tchar rawResponse[] = rpc.buildRawResponse(safeProcess(req))",
+                "\ts.send(rawResponse)",
+                "}",
+            ]),
+            # a request that cannot be decoded is answered with 500, the worker keeps going
+            ("Response safeProcess(Request req)", [
+                "try {",
+                "\treturn process(req)",
+                "} catch(Exception e) {",
+                '\tout.println("$debugMSG - request could not be processed, answered with 500")',
+                "}",
+                'return rpc.buildResponse(rpc.getMethodFromMetadata(req.meta), "500")',
+            ]),
+        ]